@@ -0,0 +1,199 @@
+"""
+asyncio interface for rendering animations, e.g. behind a web service. One event loop can drive
+many renders: the data is loaded in threads, frames are rendered in a shared pool of worker
+processes and the number of renders running at once is bounded.
+
+    async with RenderService(max_concurrent=4) as service:
+        await service.render(animator, 'out.mp4', format='mp4', progress=print)
+
+or, with the default service of the process:
+
+    await animator.render_async('out.mp4', format='mp4')
+"""
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import weakref
+
+import iriscubeanimator as ica
+import workerpool
+
+from typing import Callable, Union
+
+# Animators kept unpickled by each worker process, so chunks of the same render reuse them
+WORKER_ANIMATOR_COUNT = 4
+
+# Animators of the renders handled by this worker process, by render id
+_worker_animators = collections.OrderedDict()
+
+# Service used by Animator.render_async when none is given
+_default_service = None
+
+
+def _render_chunk(args: tuple) -> tuple:
+    """
+    Render a chunk of frames of a render in a worker process. Returns the number of frames
+    rendered and the worker's profiler records.
+    """
+    render_id, animator_bytes, start, stop, frame_dir, dpi = args
+    if render_id not in _worker_animators:
+        _worker_animators[render_id] = pickle.loads(animator_bytes)
+        while len(_worker_animators) > WORKER_ANIMATOR_COUNT:
+            _worker_animators.popitem(last=False)
+
+    return ica.render_frame_chunk(_worker_animators[render_id], range(start, stop), frame_dir, dpi)
+
+
+def _init_render_worker() -> None:
+    "Use the Agg backend in the worker processes, which only write frames to files"
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+async def _emit(progress: Union[Callable, None], event: dict) -> None:
+    "Pass a progress event to the callback, awaiting it if it is a coroutine function"
+    if progress == None:
+        return
+    result = progress(event)
+    if asyncio.iscoroutine(result):
+        await result
+
+
+class RenderService():
+    """
+    Renders animations for asyncio code. Renders share a pool of spawned worker processes,
+    and at most max_concurrent of them on each event loop load, render and encode at once; the
+    rest wait their turn. The service can be used from several event loops, one after another
+    or in different threads.
+    """
+    def __init__(self, max_concurrent: int = 2, processes: Union[int, None] = None, chunks_per_process: int = 2) -> None:
+        """
+        max_concurrent : int (optional)
+            renders running at once
+        processes : Union[int, None] (optional)
+            worker processes shared by the renders, defaults to the number of cpus
+        chunks_per_process : int (optional)
+            chunks each render is split into per worker process, more chunks give finer progress
+        """
+        self.max_concurrent = max_concurrent
+        self.processes = processes if processes != None else os.cpu_count()
+        self.chunks_per_process = chunks_per_process
+        self.pool = None
+        # semaphores are bound to the event loop they are first used in, so each loop has its own
+        self.semaphores = weakref.WeakKeyDictionary()
+        self.render_ids = itertools.count()
+
+
+    def __get_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        "Start the worker processes on first use"
+        if self.pool == None:
+            self.pool = workerpool.make_process_pool(self.processes, _init_render_worker, executor=True)
+        return self.pool
+
+
+    def __get_semaphore(self) -> asyncio.Semaphore:
+        "Return the semaphore bounding the renders of the running event loop"
+        loop = asyncio.get_running_loop()
+        if loop not in self.semaphores:
+            self.semaphores[loop] = asyncio.Semaphore(self.max_concurrent)
+        return self.semaphores[loop]
+
+
+    async def render(self, animator: ica.Animator, path: str, format: str = 'gif', dpi: Union[int, None] = None, encoder: Union[str, None] = None, progress: Union[Callable, None] = None) -> dict:
+        """
+        Render the animation and save it to path. Cancelling the task stops the render: chunks
+        that have not started are dropped and the frames rendered so far are deleted.
+        Returns the path, number of frames and time taken.
+
+        animator : ica.Animator
+            animation to render
+        path : str
+            output file
+        format : str (optional)
+            save as 'gif' or 'mp4'
+        dpi : Union[int, None] (optional)
+            resolution of the frames, defaults to 200 for mp4 and the figure dpi for gif to match save_animation()
+        encoder : Union[str, None] (optional)
+            default chosen by FFMpegWriter is 'h264'
+        progress : Union[Callable, None] (optional)
+            called, or awaited if it is a coroutine function, with a dict for every step of the
+            render: its id, the stage ('queued', 'loading', 'rendering', 'encoding' or 'done'),
+            the frames done and the frame total
+        """
+        if dpi == None and format == 'mp4':
+            dpi = 200
+
+        loop = asyncio.get_running_loop()
+        render_id = next(self.render_ids)
+        event = {'id': render_id, 'path': path, 'stage': 'queued', 'frames_done': 0, 'frame_total': None}
+        await _emit(progress, dict(event))
+
+        async with self.__get_semaphore():
+            start_time = time.perf_counter()
+
+            # loading the data and finding the colour scales blocks, so it runs in a thread
+            event['stage'] = 'loading'
+            await _emit(progress, dict(event))
+            frame_total = await loop.run_in_executor(None, animator.prepare)
+            animator_bytes = await loop.run_in_executor(None, pickle.dumps, animator)
+
+            event.update(stage='rendering', frame_total=frame_total)
+            await _emit(progress, dict(event))
+
+            frame_dir = tempfile.mkdtemp(prefix='iriscubeanimator_')
+            pool = self.__get_pool()
+            chunks = ica.split_frames(frame_total, min(frame_total, self.processes*self.chunks_per_process))
+            futures = [
+                loop.run_in_executor(pool, _render_chunk, (render_id, animator_bytes, chunk.start, chunk.stop, frame_dir, dpi))
+                for chunk in chunks
+            ]
+            try:
+                for future in asyncio.as_completed(futures):
+                    frames_rendered, records = await future
+                    if animator.get_profiler() != None:
+                        animator.get_profiler().extend(records)
+                    event['frames_done'] += frames_rendered
+                    await _emit(progress, dict(event))
+
+                event['stage'] = 'encoding'
+                await _emit(progress, dict(event))
+                await loop.run_in_executor(None, animator.merge_shards, frame_dir, path, format, encoder)
+            finally:
+                # cancels the chunks that have not started if the render was cancelled or failed
+                for future in futures:
+                    future.cancel()
+                await loop.run_in_executor(None, shutil.rmtree, frame_dir, True)
+
+            event['stage'] = 'done'
+            await _emit(progress, dict(event))
+
+        return {'path': path, 'frames': frame_total, 'time': time.perf_counter() - start_time}
+
+
+    def close(self) -> None:
+        "Stop the worker processes"
+        if self.pool != None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *args) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+def get_default_service() -> RenderService:
+    "Return the service shared by the process, created on first use"
+    global _default_service
+    if _default_service == None:
+        _default_service = RenderService()
+    return _default_service
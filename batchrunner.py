@@ -0,0 +1,325 @@
+"""
+Render many animations from a single job spec, sharing the loaded data between them.
+
+The job spec is a json file, or a yaml file if PyYAML is installed, listing the animations:
+
+    workers: 4                      # animations rendered at once
+    stats_cache: stats.json         # optional on-disk cache of the colour scales
+    defaults:                       # options used by every animation unless it sets its own
+      format: mp4
+      dpi: 100
+    animations:
+      - output: out/temperature.mp4
+        fig_dims: [1, 2]
+        interval: 100               # ms between frames
+        pause_frames: [[3, 2]]
+        color_steps: 25
+        plot_method: raster         # or contourf
+        coastlines: auto            # or 110m, 50m, 10m
+        persistent_artists: true
+        level_of_detail: mean       # or max, nearest
+        title: Surface temperature
+        panels:
+          - path: data/*.nc
+            catalog: false          # load with CatalogLoader rather than IrisDataLoader
+            cube: air_temperature
+            constraints: {latitude: [-30, 30], time: ['2000-01-01', '2000-06-30'], model_level_number: 1}
+            iterator: time
+            x: [longitude]
+            y: [latitude]
+            projection: Robinson    # or {name: Orthographic, central_longitude: 10}
+
+Each file is opened once, each cube is loaded and constrained once and the colour scale of each
+constrained cube is found once, however many animations use it. The animations are then rendered
+in spawned worker processes.
+
+Usage:
+    python batchrunner.py jobs.yaml --workers 8
+"""
+import argparse
+import datetime
+import functools
+import json
+import os
+import sys
+import time
+import traceback
+
+from typing import TYPE_CHECKING, List, Union
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import irisdataloader as idl
+import catalogloader as cl
+import iriscubehandler as ich
+import iriscubeanimator as ica
+import statscache
+import workerpool
+
+if TYPE_CHECKING:
+    import cartopy.crs as ccrs
+    import iris.time
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+def load_spec(path: str) -> dict:
+    """
+    Read a job spec from a json or yaml file.
+
+    path : str
+        path to the job spec, yaml if it ends in .yaml or .yml
+    """
+    with open(path, 'r') as f:
+        if path.endswith(('.yaml', '.yml')):
+            if yaml == None:
+                raise Exception('PyYAML is not installed, write the job spec as json instead.')
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def _in_range(low, high, cell) -> bool:
+    "Constraint function selecting cells between low and high inclusive"
+    return low <= cell <= high
+
+
+def _equal_to(value, cell) -> bool:
+    "Constraint function selecting cells equal to value"
+    return cell == value
+
+
+def _parse_date(value: str) -> 'iris.time.PartialDateTime':
+    "Turn an ISO 8601 date into a PartialDateTime, which compares with dates of any calendar"
+    import iris.time
+
+    date = datetime.datetime.fromisoformat(value)
+    return iris.time.PartialDateTime(year=date.year, month=date.month, day=date.day, hour=date.hour, minute=date.minute, second=date.second)
+
+
+def _make_condition(value):
+    """
+    Turn the value of a constraint in the job spec into a condition for Cube.set_constraint.
+    A pair of values selects the range between them, a single value selects that value.
+    Dates are given as ISO 8601 strings. Partial functions are used rather than lambdas so
+    that the constraints can be sent to the worker processes of CatalogLoader.
+    """
+    if isinstance(value, list):
+        assert len(value) == 2, f'A constraint range needs a first and last value. Received {value}.'
+        low, high = [_parse_date(bound) if isinstance(bound, str) else bound for bound in value]
+        return functools.partial(_in_range, low, high)
+
+    return functools.partial(_equal_to, _parse_date(value) if isinstance(value, str) else value)
+
+
+def _make_projection(value: Union[str, dict, None]) -> Union['ccrs.Projection', None]:
+    """
+    Build a cartopy projection from its name, or from a dict of its name and arguments.
+    """
+    # cartopy is only loaded by jobs that set a projection
+    import cartopy.crs as ccrs
+
+    if value == None:
+        return None
+    if isinstance(value, str):
+        return getattr(ccrs, value)()
+
+    arguments = dict(value)
+    return getattr(ccrs, arguments.pop('name'))(**arguments)
+
+
+def _run_job(job: dict) -> dict:
+    """
+    Render a single animation. Runs in the worker processes of BatchRunner.
+    Returns the output path, the time taken and the error if it failed.
+    """
+    start = time.perf_counter()
+    try:
+        output_dir = os.path.dirname(os.path.abspath(job['output']))
+        os.makedirs(output_dir, exist_ok=True)
+        job['animator'].stream_animation(job['output'], format=job['format'], dpi=job['dpi'])
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+
+    return {'output': job['output'], 'time': time.perf_counter() - start, 'error': error}
+
+
+class BatchRunner():
+    """
+    Plans and renders the animations of a job spec. Files, cubes and colour scales used by
+    several animations are loaded and computed once and shared between them.
+    """
+    def __init__(self, spec: Union[dict, str], workers: Union[int, None] = None) -> None:
+        """
+        spec : Union[dict, str]
+            job spec, or the path of a json or yaml file holding it
+        workers : Union[int, None] (optional)
+            number of animations rendered at once, overrides the spec. Defaults to the number of cpus.
+        """
+        if isinstance(spec, str):
+            spec = load_spec(spec)
+
+        self.spec = spec
+        self.workers = workers if workers != None else spec.get('workers', os.cpu_count())
+        self.stats_cache = statscache.StatsCache(spec['stats_cache']) if spec.get('stats_cache') != None else None
+        self.loaders = {}
+        self.shared_cubes = {}
+        self.jobs = None
+
+
+    def __get_loader(self, panel: dict):
+        """
+        Return the loader of the panel's files, opening them only the first time.
+
+        panel : dict
+            panel of an animation in the job spec
+        """
+        catalog = panel.get('catalog', False)
+        key = (json.dumps(panel['path']), catalog)
+        if key not in self.loaders:
+            if catalog:
+                self.loaders[key] = cl.CatalogLoader(panel['path'])
+            else:
+                self.loaders[key] = idl.IrisDataLoader(panel['path'], metadata_only=True)
+        return self.loaders[key]
+
+
+    def __get_shared_cube(self, panel: dict) -> ich.Cube:
+        """
+        Return the constrained cube of the panel, loading it and finding its colour scale only
+        the first time it is used.
+
+        panel : dict
+            panel of an animation in the job spec
+        """
+        constraints = panel.get('constraints', {})
+        key = (json.dumps(panel['path']), panel.get('catalog', False), panel['cube'], json.dumps(constraints, sort_keys=True))
+        if key not in self.shared_cubes:
+            cube = ich.Cube(self.__get_loader(panel), panel['cube'])
+            if self.stats_cache != None:
+                cube.set_stats_cache(self.stats_cache)
+            for coord, value in constraints.items():
+                cube.set_constraint(coord, _make_condition(value))
+
+            cube.get_cube_min_max()
+            self.shared_cubes[key] = cube
+
+        return self.shared_cubes[key]
+
+
+    def __build_animator(self, animation: dict) -> ica.Animator:
+        """
+        Build the animator of an animation in the job spec.
+
+        animation : dict
+            animation with the spec defaults filled in
+        """
+        cubes = []
+        for panel in animation['panels']:
+            cube = self.__get_shared_cube(panel).copy()
+            cube.set_iterator_coord(panel.get('iterator', 'time'), panel.get('prettier_iterator', False))
+            cube.set_axes_coords(panel.get('x', ['longitude']), panel.get('y', ['latitude']))
+            projection = _make_projection(panel.get('projection'))
+            if projection != None:
+                cube.set_projection(projection)
+            cubes.append(cube)
+
+        animator = ica.Animator(cubes, tuple(animation.get('fig_dims', (1, 1))))
+        animator.set_animation_interval(animation.get('interval', 100))
+        animator.set_pause_frames([tuple(pause) for pause in animation.get('pause_frames', [])])
+        animator.set_plot_color_steps(animation.get('color_steps', 25))
+        animator.set_plot_method(animation.get('plot_method', 'contourf'))
+        animator.use_persistent_artists(animation.get('persistent_artists', False))
+        animator.set_level_of_detail(animation.get('level_of_detail'))
+        if animation.get('coastlines') != None:
+            animator.include_coastlines(animation['coastlines'])
+        if animation.get('title') != None:
+            animator.set_alternative_master_title(animation['title'])
+
+        return animator
+
+
+    def plan(self) -> List[dict]:
+        """
+        Load the shared data, apply the constraints and find the colour scales, then return a
+        job for each animation holding its animator, output path, format and dpi.
+        """
+        defaults = self.spec.get('defaults', {})
+        self.jobs = []
+        for animation in self.spec['animations']:
+            animation = {**defaults, **animation}
+            self.jobs.append({
+                'output': animation['output'],
+                'format': animation.get('format', 'gif'),
+                'dpi': animation.get('dpi'),
+                'animator': self.__build_animator(animation),
+            })
+
+        return self.jobs
+
+
+    def get_plan_summary(self) -> dict:
+        "Return how many animations, files and shared cubes the plan holds"
+        if self.jobs == None:
+            self.plan()
+        return {'animations': len(self.jobs), 'loaders': len(self.loaders), 'cubes': len(self.shared_cubes)}
+
+
+    def run(self, print_progress: bool = True) -> List[dict]:
+        """
+        Render every animation, several at once in spawned worker processes. An animation that
+        fails does not stop the others. Returns the output path, time taken and error, None if it
+        succeeded, of every animation in the order they finished.
+
+        print_progress : bool (optional)
+            print each animation as it finishes
+        """
+        if self.jobs == None:
+            self.plan()
+
+        if self.workers <= 1 or len(self.jobs) <= 1:
+            results = map(_run_job, self.jobs)
+            return self.__collect(results, print_progress)
+
+        with workerpool.make_process_pool(min(self.workers, len(self.jobs))) as pool:
+            return self.__collect(pool.imap_unordered(_run_job, self.jobs), print_progress)
+
+
+    def __collect(self, results, print_progress: bool) -> List[dict]:
+        "Gather the results of the jobs as they finish"
+        collected = []
+        for result in results:
+            collected.append(result)
+            if print_progress == True:
+                status = 'failed' if result['error'] != None else 'done'
+                print(f"[{len(collected)}/{len(self.jobs)}] {status} {result['output']} in {result['time']:.1f} s", flush=True)
+                if result['error'] != None:
+                    print(result['error'], flush=True)
+        return collected
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Render the animations of a job spec.')
+    parser.add_argument('spec', help='json or yaml job spec')
+    parser.add_argument('--workers', type=int, default=None, help='animations rendered at once, overrides the spec')
+    parser.add_argument('--plan-only', action='store_true', help='load the data and print the plan without rendering')
+    args = parser.parse_args(argv)
+
+    runner = BatchRunner(args.spec, args.workers)
+    start = time.perf_counter()
+    summary = runner.get_plan_summary()
+    print(f"planned {summary['animations']} animations from {summary['loaders']} sources and {summary['cubes']} cubes in {time.perf_counter() - start:.1f} s", flush=True)
+    if args.plan_only:
+        return
+
+    results = runner.run()
+    failed = [result for result in results if result['error'] != None]
+    print(f'{len(results) - len(failed)} of {len(results)} animations rendered')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark how long importing each module takes in a fresh interpreter, and which parts of the
+plotting stack each import pulls in. The data-side modules should not load any of them.
+
+Usage:
+    python benchmarks/import_times.py
+    python benchmarks/import_times.py --modules iriscubehandler --repeat 10 --output imports.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules timed by default, data-side first
+MODULES = ['irisdataloader', 'catalogloader', 'statscache', 'iriscubehandler', 'iriscubeanimator', 'batchrunner']
+
+# Heavy modules reported when an import loads them
+HEAVY_MODULES = ['matplotlib', 'matplotlib.pyplot', 'iris.cube', 'iris.plot', 'cartopy', 'shapely', 'dask', 'netCDF4']
+
+# Run in the fresh interpreter, prints the import time and the heavy modules loaded
+TIMING_SCRIPT = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"time": elapsed, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+'''
+
+
+def time_import(module: str, repeat: int) -> dict:
+    """
+    Import the module repeat times, each in a new interpreter, and return the median time
+    and the heavy modules it loaded.
+    """
+    times = []
+    loaded = []
+    for _ in range(repeat):
+        script = TIMING_SCRIPT.format(root=REPO_ROOT, module=module, heavy=HEAVY_MODULES)
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        times.append(result['time'])
+        loaded = result['loaded']
+
+    return {'time': float(np.median(times)), 'times': times, 'loaded': loaded}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the import time of the modules.')
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5, help='imports of each module, the median time is reported')
+    parser.add_argument('--output', default=None, help='write the results to this json file')
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        results[module] = time_import(module, args.repeat)
+        print(f"{module:<18} {results[module]['time']:6.3f} s  loads {', '.join(results[module]['loaded']) or 'nothing heavy'}", flush=True)
+
+    if args.output != None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
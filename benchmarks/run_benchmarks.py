@@ -0,0 +1,332 @@
+"""
+Benchmarks for the load -> slice -> render -> encode pipeline.
+
+Synthetic cubes are generated locally and saved to netCDF, then every combination of the
+requested grid sizes, frame counts, figure dimensions and projections is timed stage by stage:
+
+    load        IrisDataLoader and Cube handlers built from the file
+    stats       min and max of the data, as found before animating
+    slice       every slice of every panel realised with Cube.get_slice
+    render      every frame drawn and saved as a png with Animator.render_shard
+    gif, mp4    the whole animation streamed to a file with Animator.stream_animation
+
+The median time, peak resident memory and memory growth of each stage are written as json.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --grids 180x360 --frames 50 --fig-dims 1x1 2x2 --projections none robinson
+    python benchmarks/run_benchmarks.py --compare base.json results.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+from typing import Callable, List, Tuple, Union
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import iris
+import iris.coords
+import iris.coord_systems
+import iris.cube
+import cartopy.crs as ccrs
+import irisdataloader as idl
+import iriscubehandler as ich
+import iriscubeanimator as ica
+
+# Projections the benchmarks can be run with, 'none' plots on the data's own grid
+PROJECTIONS = {
+    'none': None,
+    'robinson': ccrs.Robinson,
+    'orthographic': ccrs.Orthographic,
+}
+
+# Interval between memory samples in seconds
+MEMORY_SAMPLE_INTERVAL = 0.005
+
+
+class PeakMemorySampler():
+    """
+    Samples the resident memory of the process in a background thread and records the peak.
+    Reads /proc/self/statm where available and falls back to the process-wide maximum otherwise.
+    """
+    def __init__(self) -> None:
+        self.start = 0
+        self.peak = 0
+        self.running = False
+        self.thread = None
+        self.page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+    def __read_rss(self) -> int:
+        "Current resident memory in bytes"
+        try:
+            with open('/proc/self/statm', 'r') as f:
+                return int(f.read().split()[1])*self.page_size
+        except OSError:
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return maxrss if sys.platform == 'darwin' else maxrss*1024
+
+
+    def __sample(self) -> None:
+        while self.running:
+            self.peak = max(self.peak, self.__read_rss())
+            time.sleep(MEMORY_SAMPLE_INTERVAL)
+
+
+    def __enter__(self):
+        self.start = self.peak = self.__read_rss()
+        self.running = True
+        self.thread = threading.Thread(target=self.__sample, daemon=True)
+        self.thread.start()
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        self.running = False
+        self.thread.join()
+        self.peak = max(self.peak, self.__read_rss())
+
+
+def make_synthetic_cube(frames: int, ny: int, nx: int) -> iris.cube.Cube:
+    """
+    Build a time/latitude/longitude cube of smoothly moving waves on a global grid.
+
+    frames : int
+        length of the time dimension
+    ny, nx : int
+        number of latitude and longitude points
+    """
+    coord_system = iris.coord_systems.GeogCS(6371229.0)
+    time_coord = iris.coords.DimCoord(np.arange(frames, dtype=np.float64), standard_name='time', units='days since 2000-01-01')
+    latitude = iris.coords.DimCoord(np.linspace(-89.5, 89.5, ny), standard_name='latitude', units='degrees', coord_system=coord_system)
+    longitude = iris.coords.DimCoord(np.linspace(-180, 180, nx, endpoint=False), standard_name='longitude', units='degrees', coord_system=coord_system)
+
+    t = np.arange(frames)[:, None, None]
+    y = np.deg2rad(latitude.points)[None, :, None]
+    x = np.deg2rad(longitude.points)[None, None, :]
+    data = 280 + 20*np.cos(y) + 5*np.sin(3*x + 0.2*t)*np.cos(2*y - 0.1*t)
+
+    return iris.cube.Cube(data.astype(np.float32), standard_name='air_temperature', units='K',
+                          dim_coords_and_dims=[(time_coord, 0), (latitude, 1), (longitude, 2)])
+
+
+def time_stage(stage: Callable, repeat: int) -> dict:
+    """
+    Run a stage repeat times and return its median time, every time, the peak resident memory
+    and the largest growth of resident memory during a run. Stages share a process, so the
+    growth is the better measure of a single stage.
+    """
+    times = []
+    peak = 0
+    increase = 0
+    for _ in range(repeat):
+        with PeakMemorySampler() as sampler:
+            start = time.perf_counter()
+            stage()
+            times.append(time.perf_counter() - start)
+        peak = max(peak, sampler.peak)
+        increase = max(increase, sampler.peak - sampler.start)
+
+    return {'time': float(np.median(times)), 'times': times, 'peak_memory': peak, 'memory_increase': increase}
+
+
+def run_case(data_path: str, frames: int, fig_dims: Tuple[int, int], projection: str, formats: List[str], repeat: int, work_dir: str) -> dict:
+    """
+    Time every stage of the pipeline for a single configuration.
+    """
+    panel_count = fig_dims[0]*fig_dims[1]
+    handlers = []
+
+    def load() -> None:
+        handlers.clear()
+        loader = idl.IrisDataLoader(data_path)
+        for _ in range(panel_count):
+            cube = ich.Cube(loader, 'air_temperature')
+            cube.set_iterator_coord('time')
+            cube.set_axes_coords(['longitude'], ['latitude'])
+            if PROJECTIONS[projection] != None:
+                cube.set_projection(PROJECTIONS[projection]())
+            handlers.append(cube)
+
+    def stats() -> None:
+        for cube in handlers:
+            if hasattr(cube, 'max_val'):
+                del cube.min_val, cube.max_val
+            cube.get_cube_min_max()
+
+    def slice_frames() -> None:
+        for cube in handlers:
+            for index in range(frames):
+                cube.get_slice(0, index).data
+
+    def make_animator() -> ica.Animator:
+        animator = ica.Animator(list(handlers), fig_dims)
+        animator.use_persistent_artists()
+        return animator
+
+    def render() -> None:
+        frame_dir = tempfile.mkdtemp(dir=work_dir)
+        animator = make_animator()
+        animator.render_shard(frame_dir, frames=range(animator.get_frame_count()))
+        shutil.rmtree(frame_dir)
+
+    def encode(format: str) -> Callable:
+        def stage() -> None:
+            make_animator().stream_animation(os.path.join(work_dir, f'benchmark.{format}'), format=format)
+        return stage
+
+    results = {
+        'load': time_stage(load, repeat),
+        'stats': time_stage(stats, repeat),
+        'slice': time_stage(slice_frames, repeat),
+        'render': time_stage(render, repeat),
+    }
+    for format in formats:
+        results[format] = time_stage(encode(format), repeat)
+
+    return results
+
+
+def get_revision() -> Union[str, None]:
+    "Git revision of the repository, if it is a git checkout"
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> dict:
+    "Run every benchmark case and return the results"
+    if args.ffmpeg != None:
+        matplotlib.rcParams['animation.ffmpeg_path'] = args.ffmpeg
+
+    results = {
+        'revision': get_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'versions': {'numpy': np.__version__, 'matplotlib': matplotlib.__version__, 'iris': iris.__version__},
+        'repeat': args.repeat,
+        'cases': [],
+    }
+
+    work_dir = tempfile.mkdtemp(prefix='iriscubeanimator_benchmarks_')
+    try:
+        for grid, frames in itertools.product(args.grids, args.frames):
+            ny, nx = grid
+            data_path = os.path.join(work_dir, f'synthetic_{ny}x{nx}_{frames}.nc')
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                iris.save(make_synthetic_cube(frames, ny, nx), data_path)
+
+            for fig_dims, projection in itertools.product(args.fig_dims, args.projections):
+                case = {'grid': [ny, nx], 'frames': frames, 'fig_dims': list(fig_dims), 'projection': projection}
+                name = case_name(case)
+                print(f'running {name}', flush=True)
+
+                case['stages'] = run_case(data_path, frames, fig_dims, projection, args.formats, args.repeat, work_dir)
+                for stage, result in case['stages'].items():
+                    print(f"    {stage:<8} {result['time']:8.3f} s  {result['peak_memory']/1024**2:8.1f} MiB peak  {result['memory_increase']/1024**2:+8.1f} MiB", flush=True)
+
+                results['cases'].append(case)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return results
+
+
+def case_name(case: dict) -> str:
+    "Readable name identifying a benchmark case"
+    return f"grid={case['grid'][0]}x{case['grid'][1]} frames={case['frames']} fig_dims={case['fig_dims'][0]}x{case['fig_dims'][1]} projection={case['projection']}"
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> bool:
+    """
+    Print the change in time and peak memory of every stage between two result files.
+    Returns True if any stage became slower by more than the threshold.
+
+    threshold : float
+        fractional slow-down reported as a regression, e.g. 0.1 for 10%
+    """
+    with open(base_path, 'r') as f:
+        base = json.load(f)
+    with open(new_path, 'r') as f:
+        new = json.load(f)
+
+    print(f"base {base.get('revision')}  new {new.get('revision')}")
+
+    base_cases = {case_name(case): case for case in base['cases']}
+    regressed = False
+    for case in new['cases']:
+        name = case_name(case)
+        if name not in base_cases:
+            print(f'{name}: not in base results')
+            continue
+
+        print(name)
+        for stage, result in case['stages'].items():
+            base_result = base_cases[name]['stages'].get(stage)
+            if base_result == None:
+                continue
+
+            change = result['time']/base_result['time'] - 1 if base_result['time'] > 0 else 0.0
+            memory_change = result.get('memory_increase', 0) - base_result.get('memory_increase', 0)
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressed = True
+            elif change < -threshold:
+                flag = '  improved'
+
+            print(f"    {stage:<8} {base_result['time']:8.3f} -> {result['time']:8.3f} s ({change:+7.1%})  memory {memory_change/1024**2:+8.1f} MiB{flag}")
+
+    return regressed
+
+
+def parse_pair(value: str) -> Tuple[int, int]:
+    "Parse '180x360' into (180, 360)"
+    first, second = value.lower().split('x')
+    return (int(first), int(second))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the iris cube animator pipeline.')
+    parser.add_argument('--grids', nargs='+', type=parse_pair, default=[(90, 180)], help='latitude x longitude points, e.g. 180x360')
+    parser.add_argument('--frames', nargs='+', type=int, default=[20], help='number of time steps')
+    parser.add_argument('--fig-dims', nargs='+', type=parse_pair, default=[(1, 1), (2, 2)], help='panel rows x columns, e.g. 2x2')
+    parser.add_argument('--projections', nargs='+', choices=list(PROJECTIONS), default=['none', 'robinson'])
+    parser.add_argument('--formats', nargs='+', choices=['gif', 'mp4'], default=['gif', 'mp4'])
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each stage, the median time is reported')
+    parser.add_argument('--ffmpeg', default=None, help='path to ffmpeg, defaults to matplotlib\'s animation.ffmpeg_path')
+    parser.add_argument('--output', default=None, help='write the results to this json file')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='compare two result files instead of running')
+    parser.add_argument('--threshold', type=float, default=0.1, help='slow-down reported as a regression by --compare')
+    args = parser.parse_args()
+
+    if args.compare != None:
+        regressed = compare(args.compare[0], args.compare[1], args.threshold)
+        sys.exit(1 if regressed else 0)
+
+    results = run(args)
+    if args.output != None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
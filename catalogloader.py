@@ -0,0 +1,440 @@
+import iris
+import irisdataloader as idl
+import workerpool
+import cf_units
+import numpy as np
+import contextlib
+import glob
+import json
+import os
+import pickle
+import tempfile
+import warnings
+
+from typing import List, Union
+
+try:
+    import netCDF4
+except ImportError:
+    netCDF4 = None
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, where concurrent writers are not locked out
+    fcntl = None
+
+# Fewest files handed to each worker process. Starting a worker costs about as much as
+# scanning a hundred files, so small catalogs are scanned and loaded in this process.
+MIN_FILES_PER_PROCESS = 100
+
+# Version of the index entries. Files indexed by another version are rescanned.
+INDEX_VERSION = 3
+
+
+def _scan_file(path: str) -> dict:
+    """
+    Describe the variables of a single file: their names, shape, time range and grid.
+    Runs in the worker processes of CatalogLoader.
+
+    path : str
+        absolute path to the file
+    """
+    stat = os.stat(path)
+    entry = {'version': INDEX_VERSION, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'variables': []}
+
+    if netCDF4 != None and idl.is_netcdf_file(path):
+        entry['format'] = 'netcdf'
+        entry['variables'] = idl.read_netcdf_variables(path)
+
+        # coordinate variables hold the time range and grid of the variables using them
+        coords = {}
+        with netCDF4.Dataset(path, 'r') as dataset:
+            for dim in dataset.dimensions:
+                if dim not in dataset.variables or dataset.variables[dim].ndim != 1 or dataset.variables[dim].size == 0:
+                    continue
+                variable = dataset.variables[dim]
+                variable.set_auto_mask(False)
+                points = variable[:]
+                coords[dim] = _describe_coord(
+                    getattr(variable, 'standard_name', None) or dim,
+                    getattr(variable, 'units', None),
+                    getattr(variable, 'calendar', 'standard'),
+                    points
+                )
+
+        for variable in entry['variables']:
+            variable['coords'] = {dim: coords[dim] for dim in variable['dimensions'] if dim in coords}
+    else:
+        entry['format'] = 'iris'
+        for cube in iris.load(path):
+            entry['variables'].append({
+                'var_name': cube.name(),
+                'standard_name': cube.standard_name,
+                'long_name': cube.long_name,
+                'dimensions': [coord.name() for coord in cube.dim_coords],
+                'shape': list(cube.shape),
+                'coord_names': [coord.name() for coord in cube.coords()],
+                'coords': {
+                    coord.name(): _describe_coord(coord.name(), str(coord.units), coord.units.calendar or 'standard', coord.points)
+                    for coord in cube.dim_coords
+                },
+            })
+
+    return entry
+
+
+def _describe_coord(name: str, units: Union[str, None], calendar: str, points: np.ndarray) -> dict:
+    """
+    Summarise a 1-dimensional coordinate for the index. Time coordinates also get their
+    first and last dates so that files can be ordered in time.
+    """
+    description = {'name': name, 'size': int(len(points)), 'first': float(points[0]), 'last': float(points[-1])}
+
+    if units != None and ' since ' in units:
+        try:
+            unit = cf_units.Unit(units, calendar=calendar)
+            dates = unit.num2date(np.array([np.min(points), np.max(points)], dtype=np.float64))
+            description['start'] = str(dates[0])
+            description['end'] = str(dates[1])
+        except ValueError:
+            pass
+
+    return description
+
+
+def _load_file_cube(args: tuple) -> list:
+    """
+    Load a single variable from a file, keeping its data lazy. Returns the matching cubes,
+    none if the file holds nothing matching the constraint. Runs in the worker processes of CatalogLoader.
+    """
+    path, format, var_name, constraint = args
+    if format == 'netcdf':
+        name_constraint = iris.NameConstraint(var_name=var_name)
+    else:
+        name_constraint = iris.Constraint(name=var_name)
+
+    if constraint != None:
+        name_constraint = name_constraint & constraint
+
+    return list(iris.load(path, name_constraint))
+
+
+def _promote_scalar_dims(cubes, variable: dict):
+    """
+    Make the coordinate the files are split along a dimension again where a constraint has left
+    a single point of it in each file, e.g. the time of files holding one timestep each, so that
+    the cubes can be concatenated along it. Returns the cubes unchanged if there is no such coordinate.
+
+    cubes : iris.cube.CubeList
+        cubes loaded from the files of the variable, in time order
+    variable : dict
+        index entry of the variable in one of the files
+    """
+    import iris.cube
+    import iris.util
+
+    dim_names = set(variable['dimensions']) | {coord['name'] for coord in variable['coords'].values()}
+
+    # scalar coordinates whose points differ between the files
+    first = cubes[0]
+    varying = [
+        coord.name() for coord in first.coords()
+        if first.coord_dims(coord) == () and any(cube.coords(coord.name()) and cube.coord(coord.name()) != coord for cube in cubes[1:])
+    ]
+    split = [name for name in varying if name in dim_names or first.coord(name).var_name in dim_names]
+    if len(split) == 0:
+        return cubes
+
+    # coordinates varying with the split coordinate, e.g. forecast_period, are expanded along with it
+    extras = [name for name in varying if name != split[0]]
+    return iris.cube.CubeList(
+        iris.util.new_axis(cube, split[0], expand_extras=[name for name in extras if cube.coords(name)])
+        for cube in cubes
+    )
+
+
+class CatalogLoader():
+    """
+    Loads a variable spread across many files as a single lazy cube. The variables, time
+    ranges and grids of every file are kept in an on-disk index, so later runs only rescan
+    files that have changed.
+    """
+    def __init__(self, paths: Union[str, List[str]], index_path: Union[str, None] = None, processes: Union[int, None] = None) -> None:
+        """
+        paths : Union[str, List[str]]
+            glob pattern or list of files and glob patterns
+        index_path : Union[str, None] (optional)
+            path of the json index, defaults to ~/.cache/iriscubeanimator/catalog.json
+        processes : Union[int, None] (optional)
+            number of processes scanning and loading files, defaults to the number of CPUs
+        """
+        if index_path == None:
+            index_path = os.path.join(os.path.expanduser('~'), '.cache', 'iriscubeanimator', 'catalog.json')
+
+        self.index_path = index_path
+        self.processes = processes if processes != None else os.cpu_count()
+        self.loaded_cubes = {}
+
+        self.__set_paths(paths)
+        self.__update_index()
+        self.__build_variable_index()
+
+
+    def __set_paths(self, paths: Union[str, List[str]]) -> None:
+        """
+        Expand the glob patterns into the files of the catalog
+
+        paths : Union[str, List[str]]
+            glob pattern or list of files and glob patterns
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+
+        files = []
+        for path in paths:
+            files += sorted(glob.glob(path)) if glob.has_magic(path) else [path]
+
+        self.paths = [os.path.abspath(path) for path in dict.fromkeys(files)]
+        if len(self.paths) == 0:
+            raise Exception(f"No files found matching {paths}")
+
+
+    def __read_index(self) -> dict:
+        "Read the index file"
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+
+    @contextlib.contextmanager
+    def __locked(self):
+        """
+        Hold a lock on the index file while reading and rewriting it, so that processes sharing
+        the index do not overwrite each other's entries.
+        """
+        index_dir = os.path.dirname(os.path.abspath(self.index_path))
+        os.makedirs(index_dir, exist_ok=True)
+
+        with open(self.index_path + '.lock', 'w') as lock_file:
+            if fcntl != None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl != None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+    def __write_index(self, entries: dict) -> None:
+        "Atomically replace the index file"
+        index_dir = os.path.dirname(os.path.abspath(self.index_path))
+        os.makedirs(index_dir, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=index_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.index_path)
+
+
+    def __map(self, function, items: list, parallel: bool = True) -> list:
+        """
+        Apply a module-level function to every item, in parallel worker processes if there are enough items.
+        Set parallel to False if the items cannot be pickled.
+        """
+        processes = min(self.processes, len(items) // MIN_FILES_PER_PROCESS)
+        if processes <= 1 or not parallel:
+            return [function(item) for item in items]
+
+        with workerpool.make_process_pool(processes) as pool:
+            return pool.map(function, items, chunksize=max(1, len(items) // (processes*4)))
+
+
+    def __update_index(self) -> None:
+        "Rescan the files that are new or changed since they were indexed"
+        entries = self.__read_index()
+
+        stale = []
+        for path in self.paths:
+            stat = os.stat(path)
+            entry = entries.get(path)
+            if entry == None or entry.get('version') != INDEX_VERSION or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+                stale.append(path)
+
+        self.scanned_file_count = len(stale)
+        if stale:
+            scanned = dict(zip(stale, self.__map(_scan_file, stale)))
+            entries.update(scanned)
+
+            # the files are scanned without the lock, then merged into the index as it is now so
+            # that entries written by other processes in the meantime are kept
+            with self.__locked():
+                index = self.__read_index()
+                index.update(scanned)
+                # files that have been deleted are dropped from the index
+                index = {path: entry for path, entry in index.items() if os.path.exists(path)}
+                self.__write_index(index)
+
+        self.file_entries = {path: entries[path] for path in self.paths}
+
+
+    def __build_variable_index(self) -> None:
+        "Group the variables of every file by variable, in time order"
+        self.variables = {}
+        for path, entry in self.file_entries.items():
+            for variable in entry['variables']:
+                key = variable['var_name']
+                if key not in self.variables:
+                    self.variables[key] = {
+                        'var_name': key,
+                        'standard_name': variable['standard_name'],
+                        'long_name': variable['long_name'],
+                        'files': [],
+                    }
+                self.variables[key]['files'].append((path, entry['format'], variable))
+
+        for variable in self.variables.values():
+            variable['files'].sort(key=lambda file: (self.__get_time_range(file[2])[0] or '', file[0]))
+
+        self.cube_standard_names = [variable['standard_name'] for variable in self.variables.values()]
+        self.cube_long_names = [variable['long_name'] for variable in self.variables.values()]
+        self.cube_count = len(self.variables)
+
+        self.name_index = {}
+        for key, variable in self.variables.items():
+            for name in dict.fromkeys([variable['standard_name'], variable['long_name']]):
+                if name != None:
+                    self.name_index.setdefault(name, []).append(key)
+
+
+    @staticmethod
+    def __get_time_range(variable: dict) -> tuple:
+        "First and last date of an indexed variable, or (None, None) if it has no time coordinate"
+        for coord in variable.get('coords', {}).values():
+            if 'start' in coord:
+                return coord['start'], coord['end']
+        return None, None
+
+
+    def __load_variable(self, key: str, constraint: Union[iris.Constraint, None] = None):
+        """
+        Load every file holding the variable and concatenate them into a single lazy cube.
+        A constraint is applied while loading each file, so files outside it are skipped, and
+        gives the same cube as extracting it from the whole variable. Returns None if nothing
+        matches the constraint.
+
+        key : str
+            variable name of the cube in the files
+        constraint : Union[iris.Constraint, None] (optional)
+            constraint applied while loading
+        """
+        if key in self.loaded_cubes:
+            if constraint == None:
+                return self.loaded_cubes[key]
+            return self.loaded_cubes[key].extract(constraint)
+
+        # constraints built from lambdas cannot be sent to worker processes
+        try:
+            pickle.dumps(constraint)
+            parallel = True
+        except (pickle.PicklingError, AttributeError, TypeError):
+            parallel = False
+
+        # iris.cube pulls in cartopy, so it is only imported once cubes are built
+        import iris.cube
+        import iris.util
+
+        files = self.variables[key]['files']
+        loaded = self.__map(_load_file_cube, [(path, format, key, constraint) for path, format, _ in files], parallel)
+        cubes = iris.cube.CubeList(cube for file_cubes in loaded for cube in file_cubes)
+        if len(cubes) == 0:
+            return None
+
+        # per-file attributes such as history and differing time units would block the concatenation
+        iris.util.equalise_attributes(cubes)
+        iris.util.unify_time_units(cubes)
+
+        if constraint != None and len(cubes) > 1:
+            cubes = _promote_scalar_dims(cubes, files[0][2])
+
+        cube = cubes.concatenate_cube()
+        if constraint == None:
+            self.loaded_cubes[key] = cube
+        return cube
+
+
+    def __find_variable(self, cube_name: str) -> str:
+        """
+        Return the variable name of the cube whose standard name or long name is cube_name.
+
+        cube_name : str
+            name of the desired cube
+        """
+        matches = self.name_index.get(cube_name, [])
+        if len(matches) == 0:
+            raise Exception(f"No cubes found with this name: {cube_name}")
+        elif len(matches) > 1:
+            warnings.warn("Multiple cubes with this name, taking the first one.")
+
+        return matches[0]
+
+
+    def get_cube(self, cube_name: str, constraint: Union[iris.Constraint, None] = None):
+        """
+        Return the cube, concatenated across every file, whose standard name or long name is cube_name.
+
+        cube_name : str
+            name of the desired cube
+        constraint : Union[iris.Constraint, None] (optional)
+            constraint applied while loading each file. Returns None if nothing matches it.
+        """
+        return self.__load_variable(self.__find_variable(cube_name), constraint)
+
+
+    def get_coord_names(self, cube_name: str) -> List[str]:
+        """
+        Return the names of the coordinates of the cube, as indexed from its first file.
+
+        cube_name : str
+            name of the desired cube
+        """
+        _, _, variable = self.variables[self.__find_variable(cube_name)]['files'][0]
+        return variable['coord_names']
+
+
+    def get_cube_list(self) -> list:
+        import iris.cube
+        return iris.cube.CubeList(self.__load_variable(key) for key in self.variables)
+
+
+    def get_cube_names(self) -> dict:
+        return {"standard_names":self.cube_standard_names, "long_names" : self.cube_long_names}
+
+
+    def get_cube_count(self) -> int:
+        return self.cube_count
+
+
+    def get_source_paths(self) -> List[str]:
+        "Return the files in the catalog"
+        return list(self.paths)
+
+
+    def get_time_range(self, cube_name: str) -> tuple:
+        """
+        Return the first and last date of the cube across every file, as indexed.
+
+        cube_name : str
+            standard name or long name of the cube
+        """
+        ranges = [self.__get_time_range(variable) for _, _, variable in self.variables[self.__find_variable(cube_name)]['files']]
+        starts = [start for start, _ in ranges if start != None]
+        ends = [end for _, end in ranges if end != None]
+        return (min(starts) if starts else None, max(ends) if ends else None)
+
+
+    def get_file_entries(self) -> dict:
+        "Return the index entry of every file in the catalog"
+        return self.file_entries
@@ -0,0 +1,128 @@
+import concurrent.futures
+import threading
+import time
+
+from typing import Callable, Hashable, List, Union
+
+class FramePrefetcher():
+    """
+    Loads upcoming frame data in a bounded thread pool while the current frame is drawn.
+    Frames must be requested in the order given to the prefetcher.
+    """
+    def __init__(self, load: Callable, keys: List[Hashable], depth: int = 4, memory_cap: Union[int, None] = None, threads: int = 2, keep: int = 1) -> None:
+        """
+        load : Callable
+            function reading the data for a key, called from the worker threads
+        keys : List[Hashable]
+            every key that will be requested, in request order. Repeated keys are only loaded once.
+        depth : int (optional)
+            maximum number of keys loaded ahead of the one being requested
+        memory_cap : Union[int, None] (optional)
+            maximum number of bytes held by loaded keys. Lowers the depth once the size of a frame is known.
+        threads : int (optional)
+            number of loading threads
+        keep : int (optional)
+            number of keys before the requested one that stay loaded so they can be requested again
+        """
+        self.load = load
+        self.keys = list(dict.fromkeys(keys))
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+        self.depth = depth
+        self.memory_cap = memory_cap
+        self.keep = keep
+
+        self.futures = {}
+        self.next_position = 0
+        self.item_bytes = None
+        self.lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads, thread_name_prefix='frame_prefetch')
+
+        self.requests = 0
+        self.waits = 0
+        self.wait_time = 0.0
+
+
+    def __load(self, key: Hashable):
+        "Load a key in a worker thread and record the size of the first one"
+        value = self.load(key)
+        if self.item_bytes == None:
+            self.item_bytes = _nbytes(value)
+        return value
+
+
+    def __get_depth(self) -> int:
+        "Number of keys that may be loaded ahead within the memory cap"
+        if self.memory_cap == None or not self.item_bytes:
+            return self.depth
+        return max(1, min(self.depth, self.memory_cap // self.item_bytes))
+
+
+    def get(self, key: Hashable):
+        """
+        Return the data for the key, waiting for it to load if necessary.
+
+        key : Hashable
+            one of the keys given to the prefetcher
+        """
+        position = self.positions[key]
+
+        with self.lock:
+            self.requests += 1
+
+            # drop keys that are no longer needed
+            for old_key in [k for k in self.futures if self.positions[k] < position - self.keep]:
+                del self.futures[old_key]
+
+            # top up the window of keys being loaded
+            self.next_position = max(self.next_position, position)
+            while self.next_position < len(self.keys) and self.next_position <= position + self.__get_depth():
+                next_key = self.keys[self.next_position]
+                if next_key not in self.futures:
+                    self.futures[next_key] = self.executor.submit(self.__load, next_key)
+                self.next_position += 1
+
+            future = self.futures.get(key)
+            if future == None:
+                # requested again after being dropped
+                future = self.futures[key] = self.executor.submit(self.__load, key)
+
+        if not future.done():
+            start = time.perf_counter()
+            value = future.result()
+            self.waits += 1
+            self.wait_time += time.perf_counter() - start
+            return value
+
+        return future.result()
+
+
+    def get_stats(self) -> dict:
+        """
+        Return how often the renderer had to wait for data and for how long in total.
+        """
+        return {
+            'requests': self.requests,
+            'waits': self.waits,
+            'wait_fraction': self.waits/self.requests if self.requests else 0.0,
+            'wait_time': self.wait_time,
+            'depth': self.__get_depth(),
+        }
+
+
+    def close(self) -> None:
+        """
+        Stop loading and release the loaded data.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.futures = {}
+
+
+def _nbytes(value) -> int:
+    """
+    Size in bytes of loaded frame data, either an array or an iris cube.
+    """
+    if hasattr(value, 'nbytes'):
+        return value.nbytes
+    if hasattr(value, 'core_data'):
+        return value.core_data().nbytes
+    return 0
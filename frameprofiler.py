@@ -0,0 +1,188 @@
+import contextlib
+import csv
+import json
+import sys
+import time
+
+from typing import Callable, List, Union
+
+# Stages timed by the Animator, in drawing order
+STAGES = ['fetch', 'coarsen', 'plot', 'title', 'colorbar', 'coastlines', 'suptitle', 'draw', 'encode', 'save']
+
+# Fields of each timing record, in the column order of the csv export
+RECORD_FIELDS = ['frame', 'panel', 'stage', 'start', 'duration']
+
+
+class FrameProfiler():
+    """
+    Records how long each stage of drawing a frame takes, per frame and per subplot panel.
+    Stages that apply to the whole figure, such as the suptitle or encoding, have no panel.
+    """
+    def __init__(self, callbacks: Union[List[Callable], None] = None) -> None:
+        """
+        callbacks : Union[List[Callable], None] (optional)
+            functions called with every timing record as it is made, see add_callback
+        """
+        self.callbacks = list(callbacks) if callbacks != None else []
+        self.records = []
+        self.origin = time.perf_counter()
+
+
+    def add_callback(self, callback: Callable) -> None:
+        """
+        Call a function with every timing record as it is made. A record is a dict with the
+        keys frame, panel (None for whole-figure stages), stage, start and duration in seconds.
+
+        callback : Callable
+            function taking a single record
+        """
+        self.callbacks.append(callback)
+
+
+    @contextlib.contextmanager
+    def stage(self, frame: int, stage: str, panel: Union[int, None] = None):
+        """
+        Time the code run inside the context as a stage of the frame.
+
+        frame : int
+            frame number
+        stage : str
+            stage name, see STAGES
+        panel : Union[int, None] (optional)
+            subplot number, 1 <= panel <= fig_count
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_record(frame, stage, panel, start, time.perf_counter() - start)
+
+
+    def add_record(self, frame: int, stage: str, panel: Union[int, None], start: float, duration: float) -> None:
+        """
+        Store a timing record and pass it to the callbacks.
+
+        start : float
+            time.perf_counter() when the stage started
+        duration : float
+            length of the stage in seconds
+        """
+        record = {'frame': frame, 'panel': panel, 'stage': stage, 'start': start - self.origin, 'duration': duration}
+        self.records.append(record)
+        for callback in self.callbacks:
+            callback(record)
+
+
+    def extend(self, records: List[dict]) -> None:
+        """
+        Add records made elsewhere, e.g. by the profilers of parallel render workers.
+        Their start times are relative to the worker's profiler.
+        """
+        self.records.extend(records)
+
+
+    def get_records(self) -> List[dict]:
+        return self.records
+
+
+    def clear(self) -> None:
+        self.records = []
+        self.origin = time.perf_counter()
+
+
+    def get_summary(self) -> dict:
+        """
+        Return the count, total, mean and maximum duration of every stage.
+        """
+        summary = {}
+        for record in self.records:
+            stage = summary.setdefault(record['stage'], {'count': 0, 'total': 0.0, 'max': 0.0})
+            stage['count'] += 1
+            stage['total'] += record['duration']
+            stage['max'] = max(stage['max'], record['duration'])
+
+        for stage in summary.values():
+            stage['mean'] = stage['total']/stage['count']
+
+        return dict(sorted(summary.items(), key=lambda item: STAGES.index(item[0]) if item[0] in STAGES else len(STAGES)))
+
+
+    def to_json(self, path: str) -> None:
+        """
+        Write the summary and every record to a json file.
+
+        path : str
+            output file
+        """
+        with open(path, 'w') as f:
+            json.dump({'summary': self.get_summary(), 'records': self.records}, f, indent=1)
+
+
+    def to_csv(self, path: str) -> None:
+        """
+        Write every record as a row of a csv file.
+
+        path : str
+            output file
+        """
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=RECORD_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.records)
+
+
+    def __getstate__(self) -> dict:
+        """
+        Callbacks are often closures or lambdas, so they are not sent to other processes.
+        """
+        state = self.__dict__.copy()
+        state['callbacks'] = []
+        return state
+
+
+class FrameProgress():
+    """
+    Prints a live line with the number of frames done, the rate and the estimated time left.
+    """
+    def __init__(self, total: int, every: float = 0.5, stream=None) -> None:
+        """
+        total : int
+            number of frames to render
+        every : float (optional)
+            minimum seconds between updates
+        stream : file-like (optional)
+            where to print, defaults to stdout
+        """
+        self.total = total
+        self.every = every
+        self.stream = stream if stream != None else sys.stdout
+        self.done = 0
+        self.start = time.perf_counter()
+        self.last_print = None
+
+
+    def update(self, done: Union[int, None] = None) -> None:
+        """
+        Record finished frames and print the progress if enough time has passed.
+
+        done : Union[int, None] (optional)
+            total number of frames finished so far, defaults to one more than before
+        """
+        self.done = done if done != None else self.done + 1
+        now = time.perf_counter()
+        if self.last_print != None and now - self.last_print < self.every and self.done < self.total:
+            return
+
+        self.last_print = now
+        elapsed = now - self.start
+        rate = self.done/elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done)/rate if rate > 0 else 0.0
+        end = '\n' if self.done >= self.total else ''
+        self.stream.write(f'\rframe {self.done}/{self.total}  {rate:.1f} frames/s  ETA {_format_seconds(eta)}  elapsed {_format_seconds(elapsed)}' + end)
+        self.stream.flush()
+
+
+def _format_seconds(seconds: float) -> str:
+    "Format seconds as h:mm:ss"
+    seconds = int(round(seconds))
+    return f'{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
@@ -0,0 +1,398 @@
+import numpy as np
+import dask.array as da
+import statscache
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from typing import List, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, where concurrent writers are not locked out
+    fcntl = None
+
+# File written last when a cached store is complete, holding its key and size. Its modification time is the store's last use.
+CACHE_META_FILENAME = 'meta.json'
+
+# Lock file held while the cached stores are published, used or removed
+CACHE_LOCK_FILENAME = 'cache.lock'
+
+class FrameStore():
+    """
+    Frame-major copy of the plotting data of a Cube handler. Each plot gets one contiguous
+    (frames, x, y) array, held in memory or memory-mapped from disk, so any frame can be
+    read in O(1) without building a new iris cube.
+    """
+    def __init__(self, cube, directory: Union[str, None] = None, reuse: bool = False) -> None:
+        """
+        cube : iriscubehandler.Cube
+            handler with its axes coordinates set
+        directory : Union[str, None] (optional)
+            write the frames to .npy files in this directory and memory-map them.
+            The frames are held in memory if no directory is given.
+        reuse : bool (optional)
+            memory-map the frames already written to the directory by an earlier store of
+            the same cube instead of copying the data again
+        """
+        self.directory = directory
+        self.frames = []
+        self.templates = []
+        self.coord_points = []
+
+        if directory != None:
+            os.makedirs(directory, exist_ok=True)
+
+        for plot_counter in range(cube.get_plot_count()):
+            if reuse:
+                self.__open_plot(cube, plot_counter)
+            else:
+                self.__add_plot(cube, plot_counter)
+
+
+    def __add_plot(self, cube, plot_counter: int) -> None:
+        """
+        Copy the data of a single plot into frame-major order.
+
+        cube : iriscubehandler.Cube
+            handler with its axes coordinates set
+        plot_counter : int
+            0 <= plot_counter < plot_count
+        """
+        iris_cube = cube.get_cube()
+        x_coord = cube.x_plotting_coords[plot_counter]
+        y_coord = cube.y_plotting_coords[plot_counter]
+
+        # same dimension order as cube.slices([x_coord, y_coord])
+        plotted_dims = list(dict.fromkeys(iris_cube.coord_dims(x_coord) + iris_cube.coord_dims(y_coord)))
+        iterated_dims = [dim for dim in range(iris_cube.ndim) if dim not in plotted_dims]
+        frame_shape = tuple(iris_cube.shape[dim] for dim in plotted_dims)
+        frame_count = int(np.prod([iris_cube.shape[dim] for dim in iterated_dims]))
+
+        data = iris_cube.core_data()
+        if isinstance(data, da.Array):
+            is_masked = isinstance(data._meta, np.ma.MaskedArray)
+        else:
+            is_masked = np.ma.isMaskedArray(data)
+
+        # masked points are stored as NaN
+        dtype = data.dtype
+        if is_masked and not np.issubdtype(dtype, np.floating):
+            dtype = np.dtype(np.float64)
+
+        if self.directory != None:
+            path = os.path.join(self.directory, f'plot_{plot_counter}.npy')
+            frames = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(frame_count,) + frame_shape)
+        else:
+            frames = np.empty((frame_count,) + frame_shape, dtype=dtype)
+
+        if isinstance(data, da.Array):
+            data = data.astype(dtype)
+            if is_masked:
+                data = da.ma.filled(data, np.nan)
+            # copied chunk by chunk, so the whole cube is never in memory at once
+            da.store(data.transpose(iterated_dims + plotted_dims).reshape(frames.shape), frames)
+        else:
+            if is_masked:
+                data = np.ma.filled(data.astype(dtype), np.nan)
+            frames[...] = data.transpose(iterated_dims + plotted_dims).reshape(frames.shape)
+
+        if self.directory != None:
+            frames.flush()
+
+        # a single slice whose data is swapped for each frame
+        template = cube.get_slice(plot_counter, 0)
+        template.data = frames[0]
+
+        self.frames.append(frames)
+        self.templates.append(template)
+        self.coord_points.append((template.coord(x_coord).points, template.coord(y_coord).points))
+
+
+    def __open_plot(self, cube, plot_counter: int) -> None:
+        """
+        Memory-map the frames of a single plot written by an earlier store.
+
+        cube : iriscubehandler.Cube
+            handler with its axes coordinates set
+        plot_counter : int
+            0 <= plot_counter < plot_count
+        """
+        frames = np.load(os.path.join(self.directory, f'plot_{plot_counter}.npy'), mmap_mode='r')
+
+        template = cube.get_slice(plot_counter, 0)
+        template.data = frames[0]
+
+        self.frames.append(frames)
+        self.templates.append(template)
+        self.coord_points.append((template.coord(cube.x_plotting_coords[plot_counter]).points, template.coord(cube.y_plotting_coords[plot_counter]).points))
+
+
+    def get_frame(self, plot_counter: int, index: int) -> np.ndarray:
+        """
+        Return a view of the data of the requested frame, in the order of the cube's slices.
+
+        plot_counter : int
+            0 <= plot_counter < plot_count
+        index : int
+            frame index
+        """
+        return self.frames[plot_counter][index]
+
+
+    def get_slice(self, plot_counter: int, index: int):
+        """
+        Return the plot's slice with the data of the requested frame. The same iris cube is
+        returned for every frame of a plot, so use it before requesting the next frame.
+
+        plot_counter : int
+            0 <= plot_counter < plot_count
+        index : int
+            frame index
+        """
+        return self.wrap_frame(plot_counter, self.frames[plot_counter][index])
+
+
+    def wrap_frame(self, plot_counter: int, data: np.ndarray):
+        """
+        Return the plot's slice holding the given frame data, e.g. a frame read ahead by get_frame.
+
+        plot_counter : int
+            0 <= plot_counter < plot_count
+        data : np.ndarray
+            data of a single frame of the plot
+        """
+        template = self.templates[plot_counter]
+        template.data = data
+        return template
+
+
+    def get_coord_points(self, plot_counter: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the points of the x and y plotting coordinates shared by every frame of the plot.
+
+        plot_counter : int
+            0 <= plot_counter < plot_count
+        """
+        return self.coord_points[plot_counter]
+
+
+    def get_frame_count(self) -> int:
+        return len(self.frames[0]) if self.frames else 0
+
+
+    def get_nbytes(self) -> int:
+        """
+        Return the size of the stored frames in bytes
+        """
+        return sum(frames.nbytes for frames in self.frames)
+
+
+    def __getstate__(self) -> dict:
+        """
+        Memory-mapped frames are reopened from their files rather than copied into the pickle.
+        """
+        state = self.__dict__.copy()
+        if self.directory != None:
+            state['frames'] = [frames.filename for frames in self.frames]
+        return state
+
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        if self.directory != None:
+            self.frames = [np.load(path, mmap_mode='r') for path in self.frames]
+
+
+class FrameStoreCache():
+    """
+    On-disk cache of frame stores, so that repeat animations of the same constrained cube
+    read uncompressed, memory-mapped frames instead of decoding the source files again.
+    Each cached store is a directory of .npy files, one per plot, with a metadata file.
+    Stores are keyed on the source files and the constrained cube, and the least recently
+    used stores are evicted once the cache grows beyond its size limit.
+    """
+    def __init__(self, directory: Union[str, None] = None, max_bytes: int = 10*1024**3) -> None:
+        """
+        directory : Union[str, None] (optional)
+            directory holding the cached stores, defaults to ~/.cache/iriscubeanimator/frames
+        max_bytes : int (optional)
+            maximum total size of the cached stores
+        """
+        if directory == None:
+            directory = os.path.join(os.path.expanduser('~'), '.cache', 'iriscubeanimator', 'frames')
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+
+    @staticmethod
+    def make_key(cube) -> Union[str, None]:
+        """
+        Build the cache key of a cube's frame store, or None if the cube's source files are unknown.
+        The key changes whenever a source file is modified or a different constraint is applied.
+
+        cube : iriscubehandler.Cube
+            handler with its axes coordinates set
+        """
+        if not cube.source_paths:
+            return None
+
+        key = hashlib.sha1(statscache.StatsCache.make_key(cube.source_paths, cube.get_cube_name(), cube.get_fingerprint()).encode())
+        for x_coord, y_coord in zip(cube.x_plotting_coords, cube.y_plotting_coords):
+            key.update(f'|{x_coord}|{y_coord}'.encode())
+        return key.hexdigest()
+
+
+    @contextlib.contextmanager
+    def __locked(self):
+        """
+        Hold a lock on the cache while stores are published, used or removed, so that processes
+        sharing the cache do not remove or replace stores the others are using.
+        """
+        with open(os.path.join(self.directory, CACHE_LOCK_FILENAME), 'w') as lock_file:
+            if fcntl != None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl != None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+    def __read_meta(self, key: str) -> Union[dict, None]:
+        "Read the metadata of a cached store and its last use, None if the store is missing or incomplete"
+        try:
+            with open(os.path.join(self.directory, key, CACHE_META_FILENAME), 'r') as f:
+                meta = json.load(f)
+                meta['last_used'] = os.fstat(f.fileno()).st_mtime
+                return meta
+        except (FileNotFoundError, ValueError):
+            return None
+
+
+    def __write_meta(self, store_dir: str, meta: dict) -> None:
+        "Atomically replace the metadata of the store in store_dir"
+        fd, tmp_path = tempfile.mkstemp(dir=store_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(store_dir, CACHE_META_FILENAME))
+
+
+    def __touch(self, key: str) -> bool:
+        """
+        Record the use of a cached store by updating the modification time of its metadata,
+        rather than rewriting it. Returns False if the store has been removed.
+        """
+        try:
+            os.utime(os.path.join(self.directory, key, CACHE_META_FILENAME))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+    def get_store(self, cube) -> FrameStore:
+        """
+        Return the frame store of the cube, reading it from the cache if it is there and
+        writing it to the cache otherwise. Cubes with unknown source files get an in-memory store.
+
+        cube : iriscubehandler.Cube
+            handler with its axes coordinates set
+        """
+        key = self.make_key(cube)
+        if key == None:
+            return FrameStore(cube)
+
+        directory = os.path.join(self.directory, key)
+        with self.__locked():
+            if self.__touch(key):
+                return FrameStore(cube, directory, reuse=True)
+
+        # the store is built, without the lock, in a directory of its own that is only renamed to
+        # the key once complete, so an interrupted copy is never mistaken for a cached store
+        building = tempfile.mkdtemp(dir=self.directory, prefix=f'{key}.', suffix='.tmp')
+        try:
+            store = FrameStore(cube, building)
+            nbytes = store.get_nbytes()
+            del store
+            self.__write_meta(building, {
+                'key': key,
+                'name': cube.get_cube_name(),
+                'sources': [os.path.abspath(path) for path in cube.source_paths],
+                'nbytes': nbytes,
+            })
+        except BaseException:
+            shutil.rmtree(building, ignore_errors=True)
+            raise
+
+        with self.__locked():
+            if self.__touch(key):
+                # another process published the same store first, so this copy is dropped
+                shutil.rmtree(building, ignore_errors=True)
+            else:
+                # a directory without metadata is left over from an interrupted publish
+                shutil.rmtree(directory, ignore_errors=True)
+                os.replace(building, directory)
+
+            self.__evict(keep=[key])
+            return FrameStore(cube, directory, reuse=True)
+
+
+    def get_entries(self) -> List[dict]:
+        """
+        Return the metadata of every cached store
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            meta = self.__read_meta(name) if os.path.isdir(os.path.join(self.directory, name)) else None
+            # stores still being built are in directories named after their key and a suffix
+            if meta != None and meta['key'] == name:
+                entries.append(meta)
+        return entries
+
+
+    def get_total_bytes(self) -> int:
+        return sum(entry['nbytes'] for entry in self.get_entries())
+
+
+    def evict(self, keep: List[str] = []) -> None:
+        """
+        Remove the least recently used stores until the cache is within max_bytes.
+
+        keep : List[str] (optional)
+            keys of stores that must not be removed
+        """
+        with self.__locked():
+            self.__evict(keep)
+
+
+    def __evict(self, keep: List[str]) -> None:
+        "Remove the least recently used stores, with the lock held"
+        entries = sorted(self.get_entries(), key=lambda entry: entry['last_used'])
+        total = sum(entry['nbytes'] for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry['key'] in keep:
+                continue
+            shutil.rmtree(os.path.join(self.directory, entry['key']), ignore_errors=True)
+            total -= entry['nbytes']
+
+
+    def invalidate(self, source_path: Union[str, None] = None) -> None:
+        """
+        Remove cached stores. Either every store built from source_path or,
+        if no path is given, the whole cache.
+
+        source_path : Union[str, None] (optional)
+            data file whose stores should be removed
+        """
+        with self.__locked():
+            for entry in self.get_entries():
+                if source_path == None or os.path.abspath(source_path) in entry['sources']:
+                    shutil.rmtree(os.path.join(self.directory, entry['key']), ignore_errors=True)
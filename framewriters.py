@@ -0,0 +1,256 @@
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+
+from typing import Tuple, Union
+
+# File name of each frame written by PNGSequenceWriter
+PNG_FILENAME = 'frame_{:06d}.png'
+
+class FFMpegPipeWriter():
+    """
+    Streams raw RGBA frames into a single long-lived ffmpeg process, producing a gif or mp4
+    without intermediate image files. Memory use does not grow with the number of frames.
+    """
+    def __init__(self, path: str, width: int, height: int, fps: float, format: str = 'mp4', codec: Union[str, None] = None, bitrate: int = 100000, size: Union[Tuple[int, int], None] = None) -> None:
+        """
+        path : str
+            output file
+        width, height : int
+            size of every frame in pixels
+        fps : float
+            frames per second
+        format : str (optional)
+            'gif' or 'mp4'
+        codec : Union[str, None] (optional)
+            mp4 video codec, defaults to matplotlib's animation.codec ('h264')
+        bitrate : int (optional)
+            mp4 bitrate in kbit/s
+        size : Union[Tuple[int, int], None] (optional)
+            width and height of the output if the frames are to be resized by ffmpeg
+        """
+        # the encoder settings are read from matplotlib, which is loaded once a frame is drawn anyway
+        import matplotlib
+
+        scale = f'scale={size[0]}:{size[1]}:flags=area,' if size != None and tuple(size) != (width, height) else ''
+
+        command = [
+            matplotlib.rcParams['animation.ffmpeg_path'],
+            '-y',
+            '-loglevel', 'error',
+            '-f', 'rawvideo',
+            '-pix_fmt', 'rgba',
+            '-s', f'{width}x{height}',
+            '-r', str(fps),
+            '-i', 'pipe:0',
+        ]
+
+        if format == 'gif':
+            # a palette per frame keeps the filter graph streaming rather than buffering every frame
+            command += ['-filter_complex', f'{scale}split[a][b];[a]palettegen=stats_mode=single[p];[b][p]paletteuse=new=1', '-loop', '0']
+        elif format == 'mp4':
+            command += [
+                '-vcodec', codec if codec != None else matplotlib.rcParams['animation.codec'],
+                '-b:v', f'{bitrate}k',
+                '-pix_fmt', 'yuv420p',
+                '-vf', f'{scale}pad=ceil(iw/2)*2:ceil(ih/2)*2',
+            ]
+        else:
+            raise Exception(f"Unknown format '{format}'. Use 'gif' or 'mp4'.")
+
+        command.append(path)
+
+        self.path = path
+        self.frame_size = (width, height)
+        self.frame_count = 0
+        self.__stderr = tempfile.TemporaryFile()
+        self.__process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.__stderr)
+
+
+    def write_frame(self, buffer, repeated: bool = False) -> None:
+        """
+        Write a single frame.
+
+        buffer : buffer-like
+            width*height*4 bytes of RGBA data, e.g. FigureCanvasAgg.buffer_rgba(). It is written without copying.
+        repeated : bool (optional)
+            the frame is the same as the one before, e.g. during a pause
+        """
+        try:
+            self.__process.stdin.write(buffer)
+        except BrokenPipeError:
+            self.close()
+        self.frame_count += 1
+
+
+    def close(self) -> None:
+        """
+        Finish encoding and wait for ffmpeg to exit.
+        """
+        if self.__process.stdin.closed:
+            return
+
+        try:
+            self.__process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+        if self.__process.wait() != 0:
+            self.__stderr.seek(0)
+            message = self.__stderr.read().decode(errors='replace')
+            self.__stderr.close()
+            raise Exception(f'ffmpeg failed writing {self.path}:\n{message}')
+
+        self.__stderr.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class PNGSequenceWriter():
+    """
+    Saves every frame as a numbered png in a directory. Repeated frames are hard links to the
+    frame before rather than new images.
+    """
+    def __init__(self, directory: str, width: int, height: int, size: Union[Tuple[int, int], None] = None) -> None:
+        """
+        directory : str
+            directory the frames are written to, created if needed
+        width, height : int
+            size of every frame in pixels
+        size : Union[Tuple[int, int], None] (optional)
+            width and height of the saved images if the frames are to be resized
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.path = directory
+        self.frame_size = (width, height)
+        self.size = tuple(size) if size != None and tuple(size) != (width, height) else None
+        self.frame_count = 0
+
+
+    def write_frame(self, buffer, repeated: bool = False) -> None:
+        """
+        Write a single frame.
+
+        buffer : buffer-like
+            width*height*4 bytes of RGBA data
+        repeated : bool (optional)
+            the frame is the same as the one before, e.g. during a pause
+        """
+        path = os.path.join(self.path, PNG_FILENAME.format(self.frame_count))
+        if os.path.exists(path):
+            os.remove(path)
+
+        if repeated and self.frame_count > 0:
+            previous_path = os.path.join(self.path, PNG_FILENAME.format(self.frame_count - 1))
+            try:
+                os.link(previous_path, path)
+            except OSError:
+                shutil.copyfile(previous_path, path)
+        else:
+            frame_to_image(buffer, self.frame_size, self.size).save(path, compress_level=1)
+
+        self.frame_count += 1
+
+
+    def close(self) -> None:
+        pass
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class ThumbnailStripWriter():
+    """
+    Keeps a small copy of every n'th frame and saves them side by side as a single png,
+    e.g. as a preview of the animation.
+    """
+    def __init__(self, path: str, width: int, height: int, every: int = 10, thumbnail_height: int = 120, columns: Union[int, None] = None) -> None:
+        """
+        path : str
+            output png
+        width, height : int
+            size of every frame in pixels
+        every : int (optional)
+            keep one frame in every
+        thumbnail_height : int (optional)
+            height of each thumbnail in pixels
+        columns : Union[int, None] (optional)
+            thumbnails per row, defaults to a single row
+        """
+        assert every >= 1, f'every must be at least 1. Received {every}.'
+
+        self.path = path
+        self.frame_size = (width, height)
+        self.every = every
+        self.columns = columns
+        self.thumbnail_size = (max(1, round(width*thumbnail_height/height)), thumbnail_height)
+        self.thumbnails = []
+        self.frame_count = 0
+
+
+    def write_frame(self, buffer, repeated: bool = False) -> None:
+        """
+        Write a single frame.
+
+        buffer : buffer-like
+            width*height*4 bytes of RGBA data
+        repeated : bool (optional)
+            the frame is the same as the one before, e.g. during a pause
+        """
+        if self.frame_count % self.every == 0:
+            self.thumbnails.append(frame_to_image(buffer, self.frame_size, self.thumbnail_size))
+        self.frame_count += 1
+
+
+    def close(self) -> None:
+        """
+        Save the thumbnails.
+        """
+        from PIL import Image
+
+        if len(self.thumbnails) == 0:
+            return
+
+        columns = self.columns if self.columns != None else len(self.thumbnails)
+        rows = math.ceil(len(self.thumbnails)/columns)
+        width, height = self.thumbnail_size
+
+        strip = Image.new('RGBA', (columns*width, rows*height), (255, 255, 255, 0))
+        for i, thumbnail in enumerate(self.thumbnails):
+            strip.paste(thumbnail, ((i % columns)*width, (i // columns)*height))
+        strip.save(self.path)
+        self.thumbnails = []
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def frame_to_image(buffer, frame_size: Tuple[int, int], size: Union[Tuple[int, int], None] = None):
+    """
+    Copy RGBA frame data into a PIL image, resized to size if given.
+    """
+    # PIL is a dependency of matplotlib, only imported when images are written
+    from PIL import Image
+
+    image = Image.frombuffer('RGBA', frame_size, bytes(buffer), 'raw', 'RGBA', 0, 1)
+    if size != None and tuple(size) != tuple(frame_size):
+        image = image.resize(size, Image.Resampling.BOX)
+    return image
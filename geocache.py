@@ -0,0 +1,267 @@
+import numpy as np
+import collections
+import hashlib
+import os
+import tempfile
+import threading
+
+from typing import List, Tuple, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import cartopy.crs as ccrs
+    from matplotlib.path import Path
+
+class GeoCache():
+    """
+    Cache of the projection work that stays the same for every frame of an animation:
+    grids transformed into the axes projection and coastlines clipped and projected to the
+    axes extent. Results are held in memory and, if a directory is given, on disk so that
+    later runs can reuse them.
+    """
+    def __init__(self, directory: Union[str, None] = None, max_items: int = 64) -> None:
+        """
+        directory : Union[str, None] (optional)
+            directory for the on-disk layer of the cache
+        max_items : int (optional)
+            number of results held in memory. The least recently used are dropped first.
+        """
+        self.directory = directory
+        self.max_items = max_items
+        self.items = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+        if directory != None:
+            os.makedirs(directory, exist_ok=True)
+
+
+    def __get(self, kind: str, key_parts: list, compute) -> dict:
+        """
+        Return the cached arrays for the key, computing and storing them if they are not cached.
+
+        kind : str
+            type of the cached result, used in the file name
+        key_parts : list
+            strings and arrays identifying the result
+        compute : Callable
+            returns a dict of arrays for the result
+        """
+        key = hashlib.sha1()
+        for part in key_parts:
+            if isinstance(part, np.ndarray):
+                key.update(np.ascontiguousarray(part).tobytes())
+            else:
+                key.update(str(part).encode())
+            key.update(b'|')
+        key = f'{kind}_{key.hexdigest()}'
+
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                return self.items[key]
+
+        path = os.path.join(self.directory, key + '.npz') if self.directory != None else None
+        if path != None and os.path.exists(path):
+            with np.load(path) as stored:
+                result = dict(stored)
+        else:
+            result = compute()
+            if path != None:
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.npz')
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez(f, **result)
+                os.replace(tmp_path, path)
+
+        with self.lock:
+            self.items[key] = result
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+
+        return result
+
+
+    def get_projected_grid(self, projection: 'ccrs.Projection', crs: 'ccrs.Projection', x_points: np.ndarray, y_points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the grid of x and y points transformed into the projection as 2-dimensional
+        (len(y_points), len(x_points)) arrays. Points outside the projection are NaN.
+
+        projection : ccrs.Projection
+            projection of the axes
+        crs : ccrs.Projection
+            projection of the data
+        x_points, y_points : np.ndarray
+            1-dimensional grid points
+        """
+        def compute() -> dict:
+            x_grid, y_grid = np.meshgrid(x_points, y_points)
+            points = projection.transform_points(crs, x_grid, y_grid)
+            x = np.where(np.isfinite(points[..., 0]), points[..., 0], np.nan)
+            y = np.where(np.isfinite(points[..., 1]), points[..., 1], np.nan)
+            return {'x': x, 'y': y}
+
+        result = self.__get('grid', [projection.to_wkt(), crs.to_wkt(), x_points, y_points], compute)
+        return result['x'], result['y']
+
+
+    def get_raster_warp(self, projection: 'ccrs.Projection', crs: 'ccrs.Projection', x_edges: np.ndarray, y_edges: np.ndarray, wrap: bool, size: int) -> Tuple[np.ndarray, List[float]]:
+        """
+        Find, for every pixel of an image drawn in the projection, the flattened index of
+        the source grid cell it falls in, or -1 if it falls in none. Returns the index and the
+        extent of the image in the projection.
+
+        projection : ccrs.Projection
+            projection of the axes
+        crs : ccrs.Projection
+            projection of the data
+        x_edges, y_edges : np.ndarray
+            increasing cell edges of the source grid
+        wrap : bool
+            True if the x coordinate is a longitude that wraps around every 360 degrees
+        size : int
+            number of pixels along the longest side of the image
+        """
+        def compute() -> dict:
+            index, extent = _create_raster_warp(projection, crs, x_edges, y_edges, wrap, size)
+            return {'index': index, 'extent': np.array(extent)}
+
+        result = self.__get('warp', [projection.to_wkt(), crs.to_wkt(), x_edges, y_edges, wrap, size], compute)
+        return result['index'], list(result['extent'])
+
+
+    def get_coastline_paths(self, projection: 'ccrs.Projection', extent: List[float], resolution: str = '110m') -> List['Path']:
+        """
+        Return the Natural Earth coastlines projected and clipped to the extent as matplotlib paths.
+
+        projection : ccrs.Projection
+            projection of the axes
+        extent : List[float]
+            x0, x1, y0, y1 of the axes in the projection
+        resolution : str (optional)
+            Natural Earth resolution, '110m', '50m' or '10m'
+        """
+        from matplotlib.path import Path
+
+        def compute() -> dict:
+            return _project_coastlines(projection, extent, resolution)
+
+        extent = [round(float(value), 6) for value in extent]
+        result = self.__get('coast', [projection.to_wkt(), extent, resolution], compute)
+
+        # the paths are stored as one array of vertices and codes, split at the path boundaries
+        return [
+            Path(vertices, codes)
+            for vertices, codes in zip(np.split(result['vertices'], result['splits']), np.split(result['codes'], result['splits']))
+            if len(vertices) > 0
+        ]
+
+
+    def clear(self) -> None:
+        """
+        Remove every cached result from memory and disk.
+        """
+        with self.lock:
+            self.items.clear()
+
+        if self.directory != None:
+            for name in os.listdir(self.directory):
+                if name.endswith('.npz'):
+                    os.remove(os.path.join(self.directory, name))
+
+
+    def __getstate__(self) -> dict:
+        """
+        Only the on-disk layer is shared with other processes.
+        """
+        state = self.__dict__.copy()
+        state['items'] = collections.OrderedDict()
+        del state['lock']
+        return state
+
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+
+def _create_raster_warp(projection: 'ccrs.Projection', crs: 'ccrs.Projection', x_edges: np.ndarray, y_edges: np.ndarray, wrap: bool, size: int) -> Tuple[np.ndarray, List[float]]:
+    """
+    See GeoCache.get_raster_warp
+    """
+    # bounding box of the source grid in the target projection
+    x_grid, y_grid = np.meshgrid(x_edges, y_edges)
+    points = projection.transform_points(crs, x_grid, y_grid)
+    finite = np.isfinite(points[..., 0]) & np.isfinite(points[..., 1])
+    extent = [points[..., 0][finite].min(), points[..., 0][finite].max(), points[..., 1][finite].min(), points[..., 1][finite].max()]
+
+    width = extent[1] - extent[0]
+    height = extent[3] - extent[2]
+    if width >= height:
+        shape = (max(1, int(round(size*height/width))), size)
+    else:
+        shape = (size, max(1, int(round(size*width/height))))
+
+    # pixel centres in the target projection, mapped back onto the source grid
+    x_pixels = extent[0] + (np.arange(shape[1]) + 0.5)*width/shape[1]
+    y_pixels = extent[2] + (np.arange(shape[0]) + 0.5)*height/shape[0]
+    x_grid, y_grid = np.meshgrid(x_pixels, y_pixels)
+    source = crs.transform_points(projection, x_grid, y_grid)
+    x_source = source[..., 0]
+    y_source = source[..., 1]
+    if wrap:
+        x_source = (x_source - x_edges[0]) % 360 + x_edges[0]
+
+    i = np.searchsorted(x_edges, x_source, side='right') - 1
+    j = np.searchsorted(y_edges, y_source, side='right') - 1
+    inside = (i >= 0) & (i < len(x_edges) - 1) & (j >= 0) & (j < len(y_edges) - 1) & np.isfinite(x_source) & np.isfinite(y_source)
+
+    return np.where(inside, j*(len(x_edges) - 1) + i, -1), extent
+
+
+def _project_coastlines(projection: 'ccrs.Projection', extent: List[float], resolution: str) -> dict:
+    """
+    Project the Natural Earth coastlines and clip them to the extent. Returns the vertices and
+    codes of every path concatenated, with the indices at which to split them.
+    """
+    # only needed for coastlines, so imported here rather than with the module
+    import cartopy.feature as cfeature
+    from shapely.geometry import box
+    from matplotlib.path import Path
+    try:
+        from cartopy.mpl.path import shapely_to_path
+    except ImportError:
+        # cartopy < 0.23
+        from cartopy.mpl.patch import geos_to_path as shapely_to_path
+
+    feature = cfeature.NaturalEarthFeature('physical', 'coastline', resolution)
+    clip_box = box(extent[0], extent[2], extent[1], extent[3])
+
+    vertices = []
+    codes = []
+    for geometry in feature.geometries():
+        projected = projection.project_geometry(geometry, feature.crs)
+        if projected.is_empty:
+            continue
+
+        clipped = projected.intersection(clip_box)
+        if clipped.is_empty:
+            continue
+
+        paths = shapely_to_path(clipped)
+        for path in (paths if isinstance(paths, list) else [paths]):
+            path_codes = path.codes if path.codes is not None else np.full(len(path.vertices), Path.LINETO, dtype=Path.code_type)
+            if path.codes is None and len(path_codes):
+                path_codes[0] = Path.MOVETO
+            vertices.append(path.vertices)
+            codes.append(path_codes)
+
+    if not vertices:
+        return {'vertices': np.zeros((0, 2)), 'codes': np.zeros(0, dtype=Path.code_type), 'splits': np.zeros(0, dtype=int)}
+
+    return {
+        'vertices': np.concatenate(vertices),
+        'codes': np.concatenate(codes),
+        'splits': np.cumsum([len(v) for v in vertices])[:-1],
+    }
+
+
+# Shared by every Animator in the process unless another cache is set
+DEFAULT_GEO_CACHE = GeoCache()
@@ -1,10 +1,250 @@
 import iriscubehandler as ich
-import matplotlib.pyplot as plt
-import iris.plot as iplt
+import framewriters
+import frameprefetcher
+import frameprofiler
+import framestore
+import geocache
+import workerpool
 import numpy as np
-from matplotlib.animation import FuncAnimation, FFMpegWriter
 
-from typing import List, Tuple, Union
+from typing import List, Tuple, Union, TYPE_CHECKING
+import concurrent.futures
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import warnings
+
+if TYPE_CHECKING:
+    import cartopy.crs as ccrs
+
+# Plotting modules and iris.util, which pulls in cartopy, imported by _import_plotting when the first frame is rendered so that
+# importing this module, e.g. in batch workers, does not pay for the whole plotting stack
+matplotlib = None
+plt = None
+iplt = None
+iris = None
+ccrs = None
+cfeature = None
+GeoAxes = None
+FuncAnimation = None
+FFMpegWriter = None
+FigureCanvasAgg = None
+PathCollection = None
+
+# File name of each rendered frame when frames are written to a directory
+FRAME_FILENAME = 'frame_{:06d}.png'
+FRAME_FILENAME_PATTERN = 'frame_%06d.png'
+
+# File holding the hash of the inputs of each frame rendered by render_resumable
+FRAME_HASH_FILENAME = 'frame_{:06d}.sha'
+
+# Version of the frame hashes. Change it when a change to the drawing code changes how frames look.
+FRAME_HASH_VERSION = 1
+
+# Preferred axis of each guessed coordinate type when plotting, as used by iris.plot
+AXIS_ORDER = {'X': 2, 'T': 1, 'Y': -1, 'Z': -2}
+
+# Number of pixels along the longest side of raster images drawn on projected axes
+RASTER_REGRID_SIZE = 750
+
+# Formats stream_outputs can write
+OUTPUT_FORMATS = ['gif', 'mp4', 'png', 'thumbnails', 'preview']
+
+# Resolution of the frames of preview(), low so that the first frame shows quickly
+PREVIEW_DPI = 50
+
+# Ways of combining each block of grid points when coarsening slices to the panel resolution
+COARSEN_METHODS = ['mean', 'max', 'nearest']
+
+# Animator held by each worker process of the parallel renderer
+_worker_animator = None
+
+# Stand-in for a profiler stage when profiling is off
+_NO_PROFILING = contextlib.nullcontext()
+
+
+def _is_headless() -> bool:
+    "True if there is no display for interactive figures"
+    if sys.platform in ['win32', 'darwin']:
+        return False
+    return os.environ.get('DISPLAY') == None and os.environ.get('WAYLAND_DISPLAY') == None
+
+
+def _import_plotting() -> None:
+    """
+    Import the plotting modules the first time they are needed. Without a display, and unless
+    a backend has been chosen through pyplot or MPLBACKEND, the non-interactive Agg backend is used.
+    """
+    global matplotlib, plt, iplt, iris, ccrs, cfeature, GeoAxes, FuncAnimation, FFMpegWriter, FigureCanvasAgg, PathCollection
+    if plt != None:
+        return
+
+    import matplotlib
+    if 'matplotlib.pyplot' not in sys.modules and os.environ.get('MPLBACKEND') == None and _is_headless():
+        matplotlib.use('Agg')
+
+    import matplotlib.pyplot as plt
+    import iris.plot as iplt
+    import iris.util
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+    from cartopy.mpl.geoaxes import GeoAxes
+    from matplotlib.animation import FuncAnimation, FFMpegWriter
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import PathCollection
+
+
+def _slice_to_bands(data: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    """
+    Return the index of the contour band each data point falls in, matching the banding of
+    contourf. Points outside the levels, masked or NaN get the index len(levels) - 1.
+
+    data : np.ndarray
+        2-dimensional data, may be masked
+    levels : np.ndarray
+        increasing band boundaries
+    """
+    data = np.ma.filled(np.ma.asarray(data, dtype=np.float64), np.nan)
+
+    # contourf bands are closed at the top, except the lowest which is closed at both ends
+    bands = np.searchsorted(levels, data, side='left') - 1
+    bands[data == levels[0]] = 0
+
+    outside = len(levels) - 1
+    bands[(bands < 0) | (bands >= outside) | np.isnan(data)] = outside
+
+    return bands
+
+
+def _coarsen_array(data: np.ndarray, factors: Tuple[int, int], method: str) -> np.ndarray:
+    """
+    Combine every block of factors[0] x factors[1] points of a 2-dimensional array into a single
+    point. Points at the far edges that do not fill a whole block are dropped. Masked and NaN
+    points are left out of the blocks they fall in.
+
+    data : np.ndarray
+        2-dimensional data, may be masked
+    factors : Tuple[int, int]
+        block size along each dimension
+    method : str
+        'mean' or 'max' of each block, or 'nearest' to take the point at its centre
+    """
+    fy, fx = factors
+    ny, nx = data.shape[0] // fy, data.shape[1] // fx
+
+    if method == 'nearest':
+        return data[fy//2:ny*fy:fy, fx//2:nx*fx:fx]
+
+    if not np.ma.isMaskedArray(data) and np.issubdtype(data.dtype, np.floating) and np.isnan(data).any():
+        data = np.ma.masked_invalid(data)
+
+    blocks = data[:ny*fy, :nx*fx].reshape(ny, fy, nx, fx)
+    if method == 'mean':
+        return blocks.mean(axis=(1, 3))
+    return blocks.max(axis=(1, 3))
+
+
+def _coarsen_coord(coord, factor: int):
+    """
+    Return a copy of a 1-dimensional coordinate with a point at the centre of every block of factor
+    points, and bounds spanning the block, as used by _coarsen_array.
+    """
+    count = len(coord.points) // factor
+    points = coord.points[:count*factor].reshape(count, factor).mean(axis=1)
+
+    bounds = None
+    if coord.has_bounds():
+        bounds = np.stack([coord.bounds[:count*factor:factor, 0], coord.bounds[factor-1:count*factor:factor, -1]], axis=-1)
+
+    return coord.copy(points=points, bounds=bounds)
+
+
+def split_frames(frame_total: int, count: int) -> List[range]:
+    """
+    Split the frame numbers of an animation into count contiguous ranges of near equal length.
+    """
+    bounds = np.linspace(0, frame_total, count + 1).astype(int)
+    return [range(int(bounds[i]), int(bounds[i+1])) for i in range(count)]
+
+
+def _read_frame_hash(path: str) -> Union[str, None]:
+    "Hash stored next to a rendered frame, or None if there is none"
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _write_frame_hash(path: str, frame_hash: str) -> None:
+    "Atomically store the hash of a rendered frame"
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(frame_hash)
+    os.replace(tmp_path, path)
+
+
+def _link_or_copy(source: str, destination: str) -> None:
+    """
+    Hard link source to destination, copying the file if linking is not possible.
+    """
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def render_frame_chunk(animator, frames: range, frame_dir: str, dpi: Union[int, None] = None) -> Tuple[int, list]:
+    """
+    Render a contiguous range of frames of a prepared animator into frame_dir, as done by each
+    worker process of the parallel renderers. Returns the number of frames rendered and the
+    timing records of the animator's profiler, if there is one, for the parent's profiler.
+
+    animator : Animator
+        animator, prepared in this or the parent process
+    frames : range
+        frame numbers to render
+    frame_dir : str
+        directory the frames are written to
+    dpi : Union[int, None] (optional)
+        resolution of the saved frames, defaults to the figure dpi
+    """
+    animator.render_frames(frames, frame_dir, dpi)
+
+    profiler = animator.get_profiler()
+    if profiler == None:
+        return len(frames), []
+
+    records = profiler.get_records()
+    profiler.clear()
+    return len(frames), records
+
+
+def _init_render_worker(animator) -> None:
+    """
+    Store the animator sent to a worker process of the parallel renderer. The workers only
+    write frames to files, so they use the Agg backend even if they inherit a display or
+    MPLBACKEND, which would give every figure an interactive window.
+    """
+    global _worker_animator
+    import matplotlib
+    matplotlib.use('Agg')
+    _worker_animator = animator
+
+
+def _render_worker_frames(args: Tuple[int, int, str, Union[int, None]]) -> Tuple[int, list]:
+    """
+    Render a contiguous range of frames with the animator of this worker process.
+    """
+    start, stop, frame_dir, dpi = args
+    return render_frame_chunk(_worker_animator, range(start, stop), frame_dir, dpi)
+
 
 class Animator():
     """
@@ -25,13 +265,31 @@ class Animator():
         self.frame_count = 0
         self.animation_interval = 100
         self.coastlines = False
+        self.coastline_resolution = 'auto'
         self.plot_color_steps = 25
-        self.pause = False
         self.pause_frames = []
-        self.pause_start_frames = [0]
-        self.pause_end_frames = [1]
-        self.total_paused_frames = 0
+        self.frame_schedule = []
+        self.drawn_slice_index = None
         self.alternative_master_title = None
+        self.persistent_artists = False
+        self.stats_cache = None
+        self.frame_cache = None
+        self.plot_method = 'contourf'
+        self.frame_store = False
+        self.frame_store_directory = None
+        self.frame_store_cache = None
+        self.prefetch_depth = 0
+        self.prefetch_memory_cap = None
+        self.prefetch_threads = 2
+        self.prefetcher = None
+        self.geo_cache = geocache.DEFAULT_GEO_CACHE
+        self.profiler = None
+        self.profiled_frame = None
+        self.coarsen_method = None
+        self.points_per_pixel = 1
+        self.render_dpi = None
+        self.provisional_min_max = False
+        self.min_max_future = None
 
     
     def add_cubes(self, new_cubes: List[ich.Cube]) -> None:
@@ -68,11 +326,58 @@ class Animator():
         self.animation_interval = interval
 
 
-    def include_coastlines(self) -> None:
+    def include_coastlines(self, resolution: str = 'auto') -> None:
         """
         Include coastlines in final animation figure.
+
+        resolution : str (optional)
+            Natural Earth resolution, '110m', '50m' or '10m'. 'auto' chooses one from the extent of the map.
         """
+        assert resolution in ['auto', '110m', '50m', '10m'], f"Unknown coastline resolution '{resolution}'"
         self.coastlines = True
+        self.coastline_resolution = resolution
+
+
+    def set_geo_cache(self, geo_cache: geocache.GeoCache) -> None:
+        """
+        Set the cache of projected grids and coastlines. By default a cache shared by every
+        Animator in the process is used, which is kept in memory only. Give a GeoCache with
+        a directory to reuse the results across runs.
+
+        geo_cache : geocache.GeoCache
+            cache to use
+        """
+        self.geo_cache = geo_cache
+
+
+    def set_profiler(self, profiler: Union[frameprofiler.FrameProfiler, None]) -> None:
+        """
+        Time every stage of drawing each frame and subplot: fetching the slice, plotting,
+        titles, colorbars, coastlines, the suptitle, drawing and encoding or saving the frame.
+        Profiling is off by default and costs next to nothing when off.
+
+        profiler : Union[frameprofiler.FrameProfiler, None]
+            profiler recording the timings, None to stop profiling
+        """
+        self.profiler = profiler
+
+
+    def get_profiler(self) -> Union[frameprofiler.FrameProfiler, None]:
+        return self.profiler
+
+
+    def __stage(self, stage: str, n: Union[int, None] = None):
+        """
+        Return a context timing a stage of the frame being drawn, or a no-op context when not profiling.
+
+        stage : str
+            stage name, see frameprofiler.STAGES
+        n : Union[int, None] (optional)
+            subplot number, 1 <= n <= fig_count, None for stages of the whole figure
+        """
+        if self.profiler == None:
+            return _NO_PROFILING
+        return self.profiler.stage(self.profiled_frame, stage, n)
 
 
     def set_plot_color_steps(self, steps: int) -> None:
@@ -82,6 +387,247 @@ class Animator():
         self.plot_color_steps = steps
 
 
+    def use_persistent_artists(self, persistent: bool = True) -> None:
+        """
+        Build the subplots, colorbars, coastlines and titles once and only redraw
+        the plotted data and master title on each frame. Much faster for figures
+        with many subplots than clearing and rebuilding the whole figure every frame.
+
+        persistent : bool (optional)
+            set to False to return to clearing the figure on every frame
+        """
+        self.persistent_artists = persistent
+
+
+    def set_plot_method(self, method: str) -> None:
+        """
+        Set how each slice is drawn.
+
+        method : str
+            'contourf' to draw filled contours with iris.plot (default) or 'raster' to colour
+            each grid cell by its contour band and draw the slice as a single image. The raster
+            method shows the same colour bands at a fraction of the cost, but needs 1-dimensional
+            plotting coordinates.
+        """
+        assert method in ['contourf', 'raster'], f"method must be 'contourf' or 'raster'. Received {method}."
+
+        self.plot_method = method
+
+
+    def set_level_of_detail(self, method: Union[str, None] = 'mean', points_per_pixel: float = 1) -> None:
+        """
+        Coarsen every slice to about the pixel resolution of its subplot before plotting. The size
+        of each subplot in pixels is worked out from the figure size, dpi and fig_dims, then blocks
+        of grid points are combined so that no more than points_per_pixel points are plotted per
+        pixel. Grids much finer than the subplots then plot orders of magnitude faster with no
+        visible difference. Grids coarser than the subplots are plotted unchanged.
+
+        method : Union[str, None] (optional)
+            'mean' or 'max' of each block of points, 'nearest' to take the point at the centre of
+            each block, or None to plot every point (default)
+        points_per_pixel : float (optional)
+            grid points kept along each pixel of the subplot
+        """
+        assert method == None or method in COARSEN_METHODS, f"method must be one of {COARSEN_METHODS} or None. Received {method}."
+        assert points_per_pixel > 0, f'points_per_pixel must be positive. Received {points_per_pixel}.'
+
+        self.coarsen_method = method
+        self.points_per_pixel = points_per_pixel
+
+
+    def __get_coarsening(self, n: int, data_to_plot) -> dict:
+        """
+        Work out how the n'th subplot's slices are coarsened to the subplot resolution. Computed once
+        per subplot, and again if the size of the figure in pixels changes.
+
+        n : int
+            subplot number, 1 <= n <= fig_count
+        data_to_plot : iris.cube.Cube
+            2-dimensional slice to plot
+        """
+        fig = plt.gcf()
+        dpi = self.render_dpi if self.render_dpi != None else fig.dpi
+        width, height = fig.get_size_inches()*dpi
+        # the subplots share the area inside the figure margins
+        margins = fig.subplotpars
+        pixels = (width*(margins.right - margins.left)/self.fig_dims[1], height*(margins.top - margins.bottom)/self.fig_dims[0])
+
+        coarsening = self.coarsenings.get(n)
+        if coarsening != None and coarsening['pixels'] == pixels:
+            return coarsening
+
+        # pixels spanned by each dimension of the data
+        _, _, transpose = self.__get_plot_coords(data_to_plot)
+        dim_pixels = pixels if transpose else pixels[::-1]
+
+        factors = tuple(max(1, int(size // (pixel_count*self.points_per_pixel))) for size, pixel_count in zip(data_to_plot.shape, dim_pixels))
+        coarsening = {'pixels': pixels, 'factors': factors, 'index': None, 'coords': []}
+
+        if factors != (1, 1):
+            # the cube is sliced at the centre of every block, which keeps its metadata and
+            # other coordinates, then the dimension coordinates are moved to the block centres
+            coarsening['index'] = tuple(slice(factor//2, size // factor * factor, factor) for size, factor in zip(data_to_plot.shape, factors))
+            if self.coarsen_method != 'nearest':
+                for dim, factor in enumerate(factors):
+                    if factor > 1:
+                        coarsening['coords'].append(_coarsen_coord(data_to_plot.coord(dimensions=dim, dim_coords=True), factor))
+
+        self.coarsenings[n] = coarsening
+        return coarsening
+
+
+    def __coarsen_slice(self, n: int, data_to_plot):
+        """
+        Return the slice coarsened to the resolution of the n'th subplot.
+
+        n : int
+            subplot number, 1 <= n <= fig_count
+        data_to_plot : iris.cube.Cube
+            2-dimensional slice to plot
+        """
+        coarsening = self.__get_coarsening(n, data_to_plot)
+        if coarsening['index'] == None:
+            return data_to_plot
+
+        coarse = data_to_plot[coarsening['index']]
+        if self.coarsen_method != 'nearest':
+            coarse.data = _coarsen_array(data_to_plot.data, coarsening['factors'], self.coarsen_method)
+            for coord in coarsening['coords']:
+                coarse.replace_coord(coord)
+
+        return coarse
+
+
+    def use_frame_store(self, directory: Union[str, None] = None, cache: Union[framestore.FrameStoreCache, None] = None) -> None:
+        """
+        Copy each cube's plotting data into a contiguous frame-major store before animating,
+        so that frames are read by indexing an array rather than slicing the iris cube.
+
+        directory : Union[str, None] (optional)
+            memory-map the stores from this directory instead of holding them in memory
+        cache : Union[framestore.FrameStoreCache, None] (optional)
+            keep the stores in this cache so later animations of the same data reuse them.
+            Used by cubes without a cache of their own when no directory is given.
+        """
+        self.frame_store = True
+        self.frame_store_directory = directory
+        self.frame_store_cache = cache
+
+
+    def __create_frame_stores(self) -> None:
+        """
+        Create the frame store of every cube that does not have one yet
+        """
+        for i, cube in enumerate(self.cube_list):
+            if cube.frame_store == None:
+                if self.frame_store_cache != None and cube.frame_store_cache == None:
+                    cube.set_frame_store_cache(self.frame_store_cache)
+                directory = None
+                if self.frame_store_directory != None:
+                    directory = os.path.join(self.frame_store_directory, f'cube_{i}')
+                cube.create_frame_store(directory)
+
+
+    def set_prefetch(self, depth: int = 4, memory_cap: Union[int, None] = None, threads: int = 2) -> None:
+        """
+        Read and decode the data of upcoming frames in background threads while the current
+        frame is drawn. Worthwhile when reading the data is slow, e.g. on network filesystems.
+
+        depth : int (optional)
+            number of subplot slices read ahead, 0 disables prefetching
+        memory_cap : Union[int, None] (optional)
+            maximum number of bytes of slices read ahead
+        threads : int (optional)
+            number of reading threads
+        """
+        self.prefetch_depth = depth
+        self.prefetch_memory_cap = memory_cap
+        self.prefetch_threads = threads
+
+
+    def get_prefetch_stats(self) -> Union[dict, None]:
+        """
+        Return how often drawing had to wait for data during the last render, or None without prefetching.
+        """
+        if self.prefetcher == None:
+            return None
+
+        return self.prefetcher.get_stats()
+
+
+    def __start_prefetch(self, frames: range) -> None:
+        """
+        Start reading ahead the slices of the requested frames, if prefetching is enabled.
+
+        frames : range
+            frame numbers that will be drawn, in order
+        """
+        self.__stop_prefetch()
+        if self.prefetch_depth <= 0:
+            return
+
+        keys = [(n, self.frame_schedule[frame]) for frame in frames for n in range(1, self.fig_count + 1)]
+        self.prefetcher = frameprefetcher.FramePrefetcher(
+            self.__load_subplot_data,
+            keys,
+            depth=self.prefetch_depth,
+            memory_cap=self.prefetch_memory_cap,
+            threads=self.prefetch_threads,
+            keep=self.fig_count
+        )
+
+
+    def __stop_prefetch(self) -> None:
+        """
+        Stop reading ahead. The statistics stay available.
+        """
+        if self.prefetcher != None:
+            self.prefetcher.close()
+
+
+    def __load_subplot_data(self, key: Tuple[int, int]):
+        """
+        Read the data of a single subplot slice into memory. Called from the prefetch threads.
+
+        key : Tuple[int, int]
+            subplot number and slice index
+        """
+        n, slice_index = key
+        cube = self.cube_list[self.cube_selector_sequence[n-1]]
+        plot_counter = self.plotting_sequence[n-1]
+
+        if cube.frame_store != None:
+            # frame store slices share one iris cube, so only read the array here
+            return np.array(cube.get_frame(plot_counter, slice_index))
+
+        data_to_plot = cube.get_slice(plot_counter, slice_index)
+        data_to_plot.data
+        return data_to_plot
+
+
+    def set_stats_cache(self, stats_cache) -> None:
+        """
+        Read the colour scale min and max values of the cubes from an on-disk cache,
+        computing and storing them only if they are not cached yet.
+
+        stats_cache : statscache.StatsCache
+            cache shared by all the cubes of the animation
+        """
+        self.stats_cache = stats_cache
+
+
+    def set_frame_cache(self, frame_cache: Union[ich.FrameCache, None]) -> None:
+        """
+        Share a byte-budgeted cache of realised slices between every cube of the animation that
+        does not have its own. Keeps memory use predictable while slices drawn again, e.g. in
+        later renders with the same animator, are not read again.
+
+        frame_cache : Union[ich.FrameCache, None]
+            cache shared by the cubes, see iriscubehandler.FrameCache.get_stats for its counters
+        """
+        self.frame_cache = frame_cache
+
+
     def set_pause_frames(self, pause_frames: List[Tuple[Union[int, str], int]]) -> None:
         """
         Set of the frames on which to pause the animation. Also provide the number of frames to pause for.
@@ -92,26 +638,39 @@ class Animator():
         self.pause_frames = pause_frames
 
     
-    def __calculate_pause_frame_locations(self) -> None:
+    def __build_frame_schedule(self) -> None:
         """
-        Calculate the frames at which pauses start and finish.
+        Precompute the frame schedule: how many frames each slice is shown for, including pauses,
+        and from that the index of the slice shown on every frame of the animation.
+        Frames 0 and 1 both show the first slice, so frame n shows slice n - 1 before any pauses.
         """
-        buffer = 0
+        # the first slice is held for the first two frames
+        self.frame_counts = [2] + [1]*(self.smallest_frame_count - 1)
+
         for start, duration in self.pause_frames:
-            if start == 0 or start == 1:
-                raise Exception(f'For reasons that are too complicated to explain, please don\'t add a pause at frame 0 or frame 1.')
-            # elif start == 'start':
-            #     start = 0
+            if start == 0:
+                raise Exception('Frames 0 and 1 both show the first slice, add the pause at frame 1 instead of frame 0.')
             elif start == 'end':
                 start = self.smallest_frame_count - 1
             elif start < 0:
                 start += self.smallest_frame_count
 
-            self.pause_start_frames.append(start + buffer)
-            self.pause_end_frames.append(start + buffer + duration)
-            buffer += duration
+            if not 1 <= start <= self.smallest_frame_count:
+                raise Exception(f'Cannot pause at frame {start}, the animation has {self.smallest_frame_count} slices.')
+
+            self.frame_counts[start - 1] += duration
 
-        self.total_paused_frames = buffer + 1
+        self.frame_schedule = [slice_index for slice_index, count in enumerate(self.frame_counts) for _ in range(count)]
+
+
+    def __is_repeated_frame(self, frame: int) -> bool:
+        """
+        Check if the frame shows the same slice as the frame before it, i.e. it is part of a pause.
+
+        frame : int
+            frame number
+        """
+        return frame > 0 and self.frame_schedule[frame] == self.frame_schedule[frame - 1]
 
 
     def __check_plotting_dimensions(self) -> None:
@@ -138,14 +697,6 @@ class Animator():
         self.smallest_frame_count = smallest_frame_count
             
 
-    def __create_plotting_slices(self) -> None:
-        """
-        Generate the plotting slices for each cubehandler
-        """
-        for cube in self.cube_list:
-            cube.create_slices()
-
-
     def __generate_plotting_sequence(self) -> None:
         """
         Builds plotting sequence accounting for multiple plots from a single cube.
@@ -173,15 +724,75 @@ class Animator():
 
     def __set_min_max_vals(self) -> None:
         """
-        
+        Find the colour scale limits of each cube. With provisional_min_max set, cubes whose limits
+        are not already known start from the limits of their first slice while the whole cube is
+        scanned in a background thread, see __apply_min_max.
         """
         self.max_vals = []
         self.min_vals = []
-        for cube in self.cube_list:
-            vals = cube.get_cube_min_max()
+        self.min_max_future = None
+        pending = []
+        for i, cube in enumerate(self.cube_list):
+            if self.stats_cache != None and cube.stats_cache == None:
+                cube.set_stats_cache(self.stats_cache)
+
+            vals = cube.get_cached_min_max() if self.provisional_min_max == True else None
+            if vals == None and self.provisional_min_max == True:
+                vals = self.__get_first_slice_min_max(i)
+                if vals != None:
+                    pending.append(i)
+            if vals == None:
+                vals = cube.get_cube_min_max()
+
             self.min_vals.append(vals[0])
             self.max_vals.append(vals[1])
 
+        if len(pending) > 0:
+            executor = concurrent.futures.ThreadPoolExecutor(1)
+            self.min_max_future = executor.submit(lambda: {i: self.cube_list[i].get_cube_min_max() for i in pending})
+            # the scan carries on, the executor is only told to stop once it is done
+            executor.shutdown(wait=False)
+
+
+    def __get_first_slice_min_max(self, cube_selector: int) -> Union[Tuple[float, float], None]:
+        """
+        Return the min and max values of the first slice the cube shows, or None if they do
+        not span a range, e.g. a slice of a single value.
+
+        cube_selector : int
+            index of the cube in cube_list
+        """
+        n = self.cube_selector_sequence.index(cube_selector) + 1
+        data = self.cube_list[cube_selector].get_slice(self.plotting_sequence[n-1], self.frame_schedule[0]).data
+        data = np.ma.filled(data.astype(np.float64), np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            min_val, max_val = np.nanmin(data), np.nanmax(data)
+
+        if not min_val < max_val:
+            return None
+        return (float(min_val), float(max_val))
+
+
+    def __apply_min_max(self) -> None:
+        """
+        Replace provisional colour scale limits with those of the whole cubes once the background
+        scan has finished, rebuilding the persistent subplots so their colorbars follow.
+        """
+        future = self.min_max_future
+        self.min_max_future = None
+        for cube_selector, vals in future.result().items():
+            self.min_vals[cube_selector] = vals[0]
+            self.max_vals[cube_selector] = vals[1]
+
+        if self.persistent_artists == True:
+            fig = plt.gcf()
+            fig.clf()
+            self.__setup_persistent_figure(fig)
+
+        # every frame from here on is drawn with the new levels
+        self.drawn_slice_index = None
+
 
     def set_save_path(self, path: str) -> None:
         """
@@ -225,130 +836,584 @@ class Animator():
         self.alternative_master_title = title
 
 
-    def __get_master_title(self) -> str:
+    def __get_master_title(self, slice_index: int) -> str:
         """
         Return the master title
+
+        slice_index : int
+            index of the slice shown on the current frame
         """
         if self.alternative_master_title == None:
             cube = self.cube_list[0]
-            output = f'{cube.iterator_coord}: {cube.get_coord_point(cube.iterator_coord, self.pseudo_frame - 1)}'
+            output = f'{cube.iterator_coord}: {cube.get_coord_point(cube.iterator_coord, slice_index)}'
             return output
         
         return self.alternative_master_title
 
 
-    def animate(self, path: str = None, print_frame_progress: bool=False) -> None:
+    def __get_subplot_data(self, frame: int, n: int):
         """
-        Run animation
-        
-        path : str (optional)
-            new path is set if provided
-        print_frame_progress : bool (optional)
-            display the frame progress
+        Return the slice to be plotted on the n'th subplot, accounting for pauses.
+
+        frame : int
+            frame number requested by the animation
+        n : int
+            subplot number, 1 <= n <= fig_count
         """
-        if path != None:
-            self.set_save_path(path)
+        cube = self.cube_list[self.cube_selector_sequence[n-1]]
+        plot_counter = self.plotting_sequence[n-1]
+
+        if self.prefetcher != None:
+            data_to_plot = self.prefetcher.get((n, self.frame_schedule[frame]))
+            if isinstance(data_to_plot, np.ndarray):
+                data_to_plot = cube.frame_store.wrap_frame(plot_counter, data_to_plot)
+            return data_to_plot
+
+        return cube.get_slice(plot_counter, self.frame_schedule[frame])
+
+
+    def __get_levels(self, cube_selector: int) -> np.ndarray:
+        """
+        Return the contour levels of the requested cube
+
+        cube_selector : int
+            index of the cube in cube_list
+        """
+        return np.linspace(
+            self.min_vals[cube_selector], 
+            self.max_vals[cube_selector], 
+            self.plot_color_steps
+        )
+
+
+    def __create_raster_luts(self) -> None:
+        """
+        Create the colour lookup table for each cube used by the raster plot method.
+        There is one colour per contour band, spread over the whole colormap as contourf does,
+        followed by a transparent entry for points outside the levels.
+        """
+        band_count = self.plot_color_steps - 1
+        colours = plt.get_cmap()(np.linspace(0, 1, band_count))
+
+        lut = np.zeros((band_count + 1, 4), dtype=np.uint8)
+        lut[:band_count] = np.round(colours*255)
+
+        self.raster_lut = lut
+        self.raster_geometry = {}
+
+
+    def __get_plot_coords(self, data_to_plot) -> Tuple[object, object, bool]:
+        """
+        Return the horizontal and vertical coordinates of the slice, chosen as iris.plot does,
+        and whether the data has to be transposed so that rows run along the vertical coordinate.
+
+        data_to_plot : iris.cube.Cube
+            2-dimensional slice to plot
+        """
+        coords = [data_to_plot.coord(dimensions=dim, dim_coords=True) for dim in range(2)]
+
+        # same horizontal/vertical choice as iris.plot
+        vertical, horizontal = sorted(coords, key=lambda coord: (AXIS_ORDER.get(iris.util.guess_coord_axis(coord), 0), coords.index(coord)))
+
+        return horizontal, vertical, horizontal is coords[0]
+
+
+    def __get_grid_key(self, n: int, data_to_plot) -> tuple:
+        """
+        Return the key of the n'th subplot's grid in the raster geometry and projected grid
+        caches, which changes whenever the level of detail coarsens the slices differently.
+
+        n : int
+            subplot number, 1 <= n <= fig_count
+        data_to_plot : iris.cube.Cube
+            2-dimensional slice to plot
+        """
+        coarsening = self.coarsenings.get(n) if self.coarsen_method != None else None
+        return (n, data_to_plot.shape, coarsening['factors'] if coarsening != None else None)
+
+
+    def __get_raster_geometry(self, n: int, data_to_plot) -> dict:
+        """
+        Work out how the n'th subplot's slices are laid out as an image. Computed once per subplot,
+        since every slice of a subplot shares the same coordinates, and again if the level of
+        detail coarsens them differently, e.g. at another dpi.
+
+        n : int
+            subplot number, 1 <= n <= fig_count
+        data_to_plot : iris.cube.Cube
+            2-dimensional slice to plot
+        """
+        key = self.__get_grid_key(n, data_to_plot)
+        if key in self.raster_geometry:
+            return self.raster_geometry[key]
+
+        horizontal, vertical, transpose = self.__get_plot_coords(data_to_plot)
+
+        edges = []
+        for coord in [horizontal, vertical]:
+            if not coord.has_bounds():
+                coord = coord.copy()
+                coord.guess_bounds()
+            edges.append(coord.contiguous_bounds())
+
+        # images are drawn with increasing coordinates, flip the data otherwise
+        geometry = {
+            'transpose': transpose,
+            'flip_horizontal': edges[0][0] > edges[0][-1],
+            'flip_vertical': edges[1][0] > edges[1][-1],
+            'warp': None,
+        }
+        x_edges = np.sort(edges[0])
+        y_edges = np.sort(edges[1])
+        geometry['extent'] = [x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]]
+
+        # on cartopy axes the image is resampled into the axes projection once, here,
+        # rather than by cartopy every time the image is drawn
+        ax = plt.gca()
+        if isinstance(ax, GeoAxes):
+            coord_system = horizontal.coord_system
+            crs = coord_system.as_cartopy_projection() if coord_system != None else ccrs.PlateCarree()
+            wrap = horizontal.units.is_convertible('degrees')
+            geometry['warp'], geometry['extent'] = self.geo_cache.get_raster_warp(ax.projection, crs, x_edges, y_edges, wrap, RASTER_REGRID_SIZE)
+            geometry['transform'] = ax.projection
+
+        self.raster_geometry[key] = geometry
+        return geometry
+
+
+    def __plot_raster(self, n: int, data_to_plot, artist=None):
+        """
+        Draw the slice as a single image coloured by contour band and return the image.
+
+        n : int
+            subplot number, 1 <= n <= fig_count
+        data_to_plot : iris.cube.Cube
+            2-dimensional slice to plot
+        artist : matplotlib.image.AxesImage (optional)
+            image of the previous frame. Its data is replaced instead of drawing a new image.
+        """
+        cube_selector = self.cube_selector_sequence[n-1]
+        geometry = self.__get_raster_geometry(n, data_to_plot)
+        levels = self.__get_levels(cube_selector)
+
+        bands = _slice_to_bands(data_to_plot.data, levels)
+        if geometry['transpose']:
+            bands = bands.T
+        if geometry['flip_horizontal']:
+            bands = bands[:, ::-1]
+        if geometry['flip_vertical']:
+            bands = bands[::-1]
+
+        if geometry['warp'] is not None:
+            bands = np.where(geometry['warp'] >= 0, bands.ravel()[geometry['warp']], len(levels) - 1)
+
+        rgba = self.raster_lut[bands]
+
+        if artist != None:
+            artist.set_data(rgba)
+            return artist
+
+        if geometry['warp'] is not None:
+            return plt.gca().imshow(rgba, origin='lower', extent=geometry['extent'], transform=geometry['transform'], interpolation='nearest')
+
+        return plt.gca().imshow(rgba, origin='lower', extent=geometry['extent'], aspect='auto', interpolation='nearest')
+
+
+    def __get_projected_grid(self, n: int, data_to_plot) -> Union[dict, None]:
+        """
+        Return the n'th subplot's grid transformed into the projection of its cartopy axes,
+        or None if the grid cannot be contoured in projected space. Computed once per subplot,
+        and again if the level of detail coarsens it differently, as for __get_raster_geometry.
+
+        n : int
+            subplot number, 1 <= n <= fig_count
+        data_to_plot : iris.cube.Cube
+            2-dimensional slice to plot
+        """
+        key = self.__get_grid_key(n, data_to_plot)
+        if key in self.projected_grids:
+            return self.projected_grids[key]
+
+        horizontal, vertical, transpose = self.__get_plot_coords(data_to_plot)
+        coord_system = horizontal.coord_system
+        crs = coord_system.as_cartopy_projection() if coord_system != None else ccrs.PlateCarree()
+
+        x_points = horizontal.points.astype(np.float64)
+        y_points = vertical.points.astype(np.float64)
+        circular = getattr(horizontal, 'circular', False) and len(x_points) > 1
+        if circular:
+            # close the gap at the seam, as iris.plot does
+            x_points = np.append(x_points, x_points[0] + 360*np.sign(x_points[-1] - x_points[0]))
+
+        ax = plt.gca()
+        x, y = self.geo_cache.get_projected_grid(ax.projection, crs, x_points, y_points)
+
+        # contouring in projected space needs every point inside the projection and rows
+        # that do not fold back on themselves, e.g. across the edge of the map
+        x_steps = np.sign(np.diff(x, axis=1))
+        grid = None
+        if np.isfinite(x).all() and np.isfinite(y).all() and (x_steps == x_steps[:, :1]).all():
+            grid = {'x': x, 'y': y, 'transpose': transpose, 'circular': circular}
+
+        self.projected_grids[key] = grid
+        return grid
+
+
+    def __plot_projected_contourf(self, n: int, data_to_plot, grid: dict):
+        """
+        Draw filled contours of the slice on a precomputed projected grid. Cartopy then only
+        draws the contours rather than transforming the grid or the contour polygons every frame.
+
+        n : int
+            subplot number, 1 <= n <= fig_count
+        data_to_plot : iris.cube.Cube
+            2-dimensional slice to plot
+        grid : dict
+            projected grid returned by __get_projected_grid
+        """
+        cube_selector = self.cube_selector_sequence[n-1]
+
+        data = data_to_plot.data
+        if grid['transpose']:
+            data = data.T
+        if grid['circular']:
+            data = np.ma.concatenate([data, data[:, :1]], axis=1)
+
+        ax = plt.gca()
+        return ax.contourf(grid['x'], grid['y'], data, levels=self.__get_levels(cube_selector), transform=ax.projection)
+
+
+    def __add_coastlines(self) -> None:
+        """
+        Add coastlines to the current axes. On cartopy axes the coastlines are projected and
+        clipped once per projection and extent, then reused from the geo cache.
+        """
+        ax = plt.gca()
+        if not isinstance(ax, GeoAxes):
+            ax.coastlines(resolution=self.coastline_resolution)
+            return
+
+        resolution = self.coastline_resolution
+        if resolution == 'auto':
+            resolution = cfeature.AdaptiveScaler('110m', (('50m', 50), ('10m', 15))).scale_from_extent(ax.get_extent(ccrs.PlateCarree()))
+
+        extent = [*ax.get_xlim(), *ax.get_ylim()]
+        paths = self.geo_cache.get_coastline_paths(ax.projection, extent, resolution)
+
+        # same appearance as GeoAxes.coastlines
+        ax.add_collection(PathCollection(paths, facecolor='none', edgecolor='black', zorder=1.5), autolim=False)
+
 
+    def __plot_data(self, n: int, data_to_plot, artist=None):
+        """
+        Plot the data on the current axes and return the resulting artist
+
+        n : int
+            subplot number, 1 <= n <= fig_count
+        data_to_plot : iris.cube.Cube
+            2-dimensional slice to plot
+        artist : object (optional)
+            artist of the previous frame, which the raster plot method can reuse
+        """
+        cube_selector = self.cube_selector_sequence[n-1]
+
+        if self.plot_method == 'raster':
+            return self.__plot_raster(n, data_to_plot, artist)
+
+        # only on axes made with a projection, so persistent subplots draw the way the first frame did
+        if isinstance(plt.gca(), GeoAxes) and self.__get_subplot_projection(n) != None:
+            grid = self.__get_projected_grid(n, data_to_plot)
+            if grid != None:
+                return self.__plot_projected_contourf(n, data_to_plot, grid)
+
+        return iplt.contourf(
+            data_to_plot, 
+            self.plot_color_steps,
+            levels=self.__get_levels(cube_selector)
+        )
+
+
+    def __add_colorbar(self, mappable, cube_selector: int) -> None:
+        """
+        Add the colorbar for the current axes
+
+        mappable : object
+            artist the colorbar describes
+        cube_selector : int
+            index of the cube in cube_list the artist was plotted from
+        """
+        if self.plot_method == 'raster':
+            # the image holds colours rather than data, so describe the bands directly
+            levels = self.__get_levels(cube_selector)
+            mappable = matplotlib.cm.ScalarMappable(
+                norm=matplotlib.colors.BoundaryNorm(levels, len(levels) - 1),
+                cmap=matplotlib.colors.ListedColormap(self.raster_lut[:-1]/255)
+            )
+
+        ticklist = np.linspace(self.min_vals[cube_selector], self.max_vals[cube_selector], 6)
+        plt.colorbar(mappable, ax=plt.gca(), orientation="horizontal", ticks=ticklist)
+
+
+    def __get_subplot_projection(self, n: int) -> Union['ccrs.Projection', None]:
+        """
+        Return the projection of the n'th subplot
+
+        n : int
+            subplot number, 1 <= n <= fig_count
+        """
+        cube = self.cube_list[self.cube_selector_sequence[n-1]]
+        projection = cube.get_projection()
+
+        if projection == None and self.plot_method == 'raster':
+            # iris.plot draws geolocated data on cartopy axes in the data's own projection, do the same
+            coord_system = cube.coord(cube.x_plotting_coords[self.plotting_sequence[n-1]]).coord_system
+            if coord_system != None:
+                projection = coord_system.as_cartopy_projection()
+
+        return projection
+
+
+    def __draw_subplot(self, n: int, data_to_plot) -> None:
+        """
+        Create the n'th subplot from scratch and plot the data on it
+
+        n : int
+            subplot number, 1 <= n <= fig_count
+        data_to_plot : iris.cube.Cube
+            2-dimensional slice to plot
+        """
+        cube_selector = self.cube_selector_sequence[n-1]
+
+        plt.subplot(self.fig_dims[0], self.fig_dims[1], n, projection=self.__get_subplot_projection(n))
+
+        # plot the data
+        with self.__stage('plot', n):
+            artist = self.__plot_data(n, data_to_plot)
+
+        # add title
+        with self.__stage('title', n):
+            plt.gca().set_title(self.subplot_titles[cube_selector])
+
+        # Add the colorbar
+        with self.__stage('colorbar', n):
+            self.__add_colorbar(artist, cube_selector)
+
+        # Add coastlines if requested
+        if self.coastlines == True:
+            with self.__stage('coastlines', n):
+                self.__add_coastlines()
+
+
+    def __setup_persistent_figure(self, fig) -> None:
+        """
+        Create the subplots and master title once for the persistent artist mode.
+
+        fig : matplotlib.figure.Figure
+            figure used for the animation
+        """
+        self.subplot_axes = []
+        self.data_artists = [None]*self.fig_count
+        self.extra_artists = [[] for _ in range(self.fig_count)]
+        self.subplots_decorated = [False]*self.fig_count
+
+        for n in range(1, self.fig_count + 1):
+            ax = fig.add_subplot(self.fig_dims[0], self.fig_dims[1], n, projection=self.__get_subplot_projection(n))
+            self.subplot_axes.append(ax)
+
+        self.master_title_artist = fig.suptitle('')
+
+
+    def __remove_data_artist(self, artist) -> None:
+        """
+        Remove a previously plotted data artist from its axes
+
+        artist : object
+            artist returned by __plot_data
+        """
+        try:
+            artist.remove()
+        except (AttributeError, NotImplementedError):
+            # older matplotlib ContourSets are not artists themselves
+            for collection in artist.collections:
+                collection.remove()
+
+
+    def __update_persistent_subplot(self, n: int, data_to_plot) -> None:
+        """
+        Swap the data artist of the n'th subplot, leaving the rest of the subplot untouched.
+
+        n : int
+            subplot number, 1 <= n <= fig_count
+        data_to_plot : iris.cube.Cube
+            2-dimensional slice to plot
+        """
+        cube_selector = self.cube_selector_sequence[n-1]
+        ax = self.subplot_axes[n-1]
+        plt.sca(ax)
+
+        previous_artist = self.data_artists[n-1]
+        with self.__stage('plot', n):
+            # iris.plot.contourf also draws contour lines over the seams between the filled
+            # levels, which are not part of the returned artist, so note what is added to the axes
+            existing = set(map(id, ax.collections))
+            self.data_artists[n-1] = self.__plot_data(n, data_to_plot, previous_artist)
+
+            if previous_artist is not None and previous_artist is not self.data_artists[n-1]:
+                self.__remove_data_artist(previous_artist)
+            for artist in self.extra_artists[n-1]:
+                artist.remove()
+            self.extra_artists[n-1] = [collection for collection in plt.gca().collections if id(collection) not in existing and collection is not self.data_artists[n-1]]
+
+        # The levels never change so the title, colorbar and coastlines only have to be made once.
+        # They are added after the first plot since iris.plot may replace the axes with cartopy axes.
+        if self.subplots_decorated[n-1] == False:
+            self.subplot_axes[n-1] = plt.gca()
+            with self.__stage('title', n):
+                plt.gca().set_title(self.subplot_titles[cube_selector])
+            with self.__stage('colorbar', n):
+                self.__add_colorbar(self.data_artists[n-1], cube_selector)
+            if self.coastlines == True:
+                with self.__stage('coastlines', n):
+                    self.__add_coastlines()
+            self.subplots_decorated[n-1] = True
+
+
+    def __draw_frame(self, frame: int) -> bool:
+        """
+        Draw every subplot and the master title for the requested frame. Nothing is redrawn
+        if the figure already shows the frame's slice, e.g. during a pause.
+        Returns True if the figure was redrawn.
+
+        frame : int
+            frame number requested by the animation
+        """
+        if self.min_max_future != None and self.min_max_future.done():
+            self.__apply_min_max()
+
+        if self.frame_schedule[frame] == self.drawn_slice_index:
+            return False
+
+        self.profiled_frame = frame
+
+        if self.persistent_artists == False:
+            # clear the current figure
+            plt.gcf().clf()
+
+        # iterate over each subplot
+        for n in range(1, self.fig_count + 1):
+            with self.__stage('fetch', n):
+                data_to_plot = self.__get_subplot_data(frame, n)
+                # realise lazy data here rather than part way through plotting
+                data_to_plot.data
+
+            if self.coarsen_method != None:
+                with self.__stage('coarsen', n):
+                    data_to_plot = self.__coarsen_slice(n, data_to_plot)
+
+            if self.persistent_artists == True:
+                self.__update_persistent_subplot(n, data_to_plot)
+            else:
+                self.__draw_subplot(n, data_to_plot)
+
+        with self.__stage('suptitle'):
+            master_title = self.__get_master_title(self.frame_schedule[frame])
+            if self.persistent_artists == True:
+                self.master_title_artist.set_text(master_title)
+            else:
+                plt.suptitle(master_title)
+
+        self.drawn_slice_index = self.frame_schedule[frame]
+        return True
+
+
+    def __prepare_schedule(self) -> None:
+        """
+        Run the checks and work out which slice is shown on each frame, without reading any data.
+        """
         # Check the requested dimensions match the total number of cubes for plotting
         self.__check_plotting_dimensions()
 
         # Set smallest iterator dimension size
         self.__set_iterator_frame_count()
 
-        # Calculate pause locations
-        self.__calculate_pause_frame_locations()
+        # Calculate which slice is shown on each frame, including pauses
+        self.__build_frame_schedule()
 
-        # Create the figure for plotting
-        fig = plt.figure()
 
-        # Create the plotting slices
-        self.__create_plotting_slices()
+    def __prepare_animation(self) -> None:
+        """
+        Run the checks and precompute everything needed before any frame can be drawn.
+        """
+        _import_plotting()
+
+        self.__prepare_schedule()
+
+        # Create the plotting sequence
         self.__generate_plotting_sequence()
 
+        if self.frame_cache != None:
+            for cube in self.cube_list:
+                if cube.frame_cache == None:
+                    cube.set_frame_cache(self.frame_cache)
+
+        if self.frame_store == True:
+            self.__create_frame_stores()
+
         # Create subplot titles
         self.__create_subplot_titles()
 
         # Find the min and max values for the cubes
         self.__set_min_max_vals()
 
-        I = self.fig_dims[0]
-        J = self.fig_dims[1]
+        if self.plot_method == 'raster':
+            self.__create_raster_luts()
 
-        self.pause = [False]*self.fig_count
-        self.paused_frame_data = []
-        self.pseudo_frame = 1
+        self.projected_grids = {}
+        self.coarsenings = {}
 
-        self.init_plot = True
+        self.__stop_prefetch()
+        self.prefetcher = None
 
-        def update(frame=0):
-            if print_frame_progress == True and frame % 5 == 0:
-                print('frame = ', frame)
 
-            # clear the current figure
-            plt.gcf().clf()
+    def animate(self, path: str = None, print_frame_progress: bool=False) -> None:
+        """
+        Run animation
+        
+        path : str (optional)
+            new path is set if provided
+        print_frame_progress : bool (optional)
+            display the frame progress
+        """
+        if path != None:
+            self.set_save_path(path)
+
+        self.__prepare_animation()
+
+        # Create the figure for plotting
+        fig = plt.figure()
+        self.render_dpi = None
+
+        # the new figure shows nothing yet
+        self.drawn_slice_index = None
 
-            # iterate over each subplot
-            n = 0 # subplot number
-            for i in range(I): #iterate over the rows
-                for j in range(J): #iterate over the columns
-                    # select the n'th subplot
-                    n += 1
-
-                    cube_selector = self.cube_selector_sequence[n-1]
-                    cube = self.cube_list[cube_selector]
-
-                    plt.subplot(I, J, n, projection=cube.get_projection())
-
-                    # Check if pause is requested
-                    if self.pause[cube_selector] == False:
-                        data_to_plot = cube.get_next_slice(self.plotting_sequence[n-1])
-                        if self.init_plot == False and n == 1:
-                            self.pseudo_frame += 1
-                        self.init_plot = False
-                        if frame in self.pause_start_frames:
-                            # Start of a pause!
-                            self.pause[cube_selector] = True
-                            # save the data
-                            self.paused_frame_data.append(data_to_plot)
-                    else:
-                        # get paused data
-                        data_to_plot = self.paused_frame_data[n-1]
-                        # check for the end of the pause on the final subplot
-                        if frame in self.pause_end_frames and n == self.fig_count:
-                            # end the 'pause', delete the saved data and reset paused_frame_data
-                            self.pause = [False]*self.fig_count
-                            del self.paused_frame_data
-                            self.paused_frame_data = []
-                        
-
-                    # plot the data
-                    iplt.contourf(
-                        data_to_plot, 
-                        self.plot_color_steps,
-                        levels=np.linspace(
-                            self.min_vals[cube_selector], 
-                            self.max_vals[cube_selector], 
-                            self.plot_color_steps
-                        )
-                    )
-
-                    # add title
-                    plt.gca().set_title(self.subplot_titles[cube_selector])
-
-                    # Add the colorbar
-                    ticklist = np.linspace(self.min_vals[cube_selector], self.max_vals[cube_selector], 6)
-                    plt.colorbar(orientation="horizontal", ticks=ticklist)
-
-                    # Add coastlines if requested
-                    if self.coastlines == True:
-                        plt.gca().coastlines()
-                
-            plt.suptitle(self.__get_master_title())
+        # Build the axes, titles and coastlines once if requested
+        if self.persistent_artists == True:
+            self.__setup_persistent_figure(fig)
+
+        self.__start_prefetch(range(len(self.frame_schedule)))
+
+        progress = frameprofiler.FrameProgress(len(self.frame_schedule)) if print_frame_progress == True else None
+
+        def update(frame=0):
+            self.__draw_frame(frame)
+
+            if progress != None:
+                progress.update(frame + 1)
 
         self.animation = FuncAnimation(
             fig, 
             update,
-            frames=self.smallest_frame_count + self.total_paused_frames,
+            frames=len(self.frame_schedule),
             interval=self.animation_interval, 
             blit=False, 
             repeat=False
@@ -373,8 +1438,10 @@ class Animator():
             raise Exception('No animation to save! Run animate()')
 
         if format == 'gif':
+            self.render_dpi = None
             self.animation.save(self.save_path, writer='imagemagick')
         elif format == 'mp4':
+            self.render_dpi = 200
             self.animation.save(self.save_path, writer=FFMpegWriter(fps=1000/self.animation_interval, bitrate=100000, codec=encoder), dpi=200)
         
 
@@ -389,4 +1456,628 @@ class Animator():
             save as 'gif' or 'mp4'   
         """
         self.animate()
-        self.save_animation(path, format, encoder=encoder)
\ No newline at end of file
+        self.save_animation(path, format, encoder=encoder)
+
+
+    def stream_animation(self, path: str = None, format: str = 'gif', encoder: Union[str, None] = None, dpi: Union[int, None] = None, bitrate: int = 100000, print_frame_progress: bool = False) -> None:
+        """
+        Render the animation off-screen and stream every frame straight into ffmpeg.
+        Each frame's Agg buffer is written to the encoder without copying or saving
+        intermediate images, so memory use stays flat however many frames there are.
+
+        path : str (optional)
+            new path is set if provided
+        format : str (optional)
+            save as 'gif' or 'mp4'
+        encoder : Union[str, None] (optional)
+            default chosen by FFMpegWriter is 'h264'
+        dpi : Union[int, None] (optional)
+            resolution of the frames, defaults to 200 for mp4 and the figure dpi for gif to match save_animation()
+        bitrate : int (optional)
+            mp4 bitrate in kbit/s
+        print_frame_progress : bool (optional)
+            display the frame progress
+        """
+        if not self.is_save_path_set(path):
+            raise Exception('save_path not set. Provide a path or use set_save_path().')
+
+        self.stream_outputs([{'path': self.save_path, 'format': format, 'encoder': encoder, 'bitrate': bitrate}], dpi, print_frame_progress)
+
+
+    def stream_outputs(self, outputs: List[dict], dpi: Union[int, None] = None, print_frame_progress: bool = False) -> None:
+        """
+        Render the animation once and stream every frame to several outputs at the same time,
+        so each extra output only costs its encoding. Each output is a dict with a path and format
+        and any of the options of its format:
+
+            'gif'         dpi
+            'mp4'         dpi, bitrate (kbit/s, default 100000), encoder
+            'png'         dpi; path is the directory the numbered frames are saved in
+            'thumbnails'  every (default 10), thumbnail_height (pixels, default 120), columns
+            'preview'     dpi, server (a previewserver.PreviewServer); path is not used
+
+        e.g. [{'path': 'a.mp4', 'format': 'mp4'}, {'path': 'a_small.mp4', 'format': 'mp4', 'dpi': 72, 'bitrate': 2000}]
+        Outputs with a lower dpi than the frames are scaled down from them.
+
+        outputs : List[dict]
+            outputs to write
+        dpi : Union[int, None] (optional)
+            resolution the frames are rendered at. Defaults to the highest dpi of the outputs other
+            than previews, or 200 if there is an mp4 without a dpi and the figure dpi otherwise.
+        print_frame_progress : bool (optional)
+            display the frame progress
+        """
+        for output in outputs:
+            assert output.get('format') in OUTPUT_FORMATS, f"Output format must be one of {OUTPUT_FORMATS}. Received {output.get('format')}."
+
+        if dpi == None:
+            # previews are scaled down from the frames of the saved outputs
+            saved = [output for output in outputs if output['format'] != 'preview'] or outputs
+            output_dpis = [output['dpi'] for output in saved if output.get('dpi') != None]
+            if len(output_dpis) > 0:
+                dpi = max(output_dpis)
+            elif any(output['format'] == 'mp4' for output in saved):
+                dpi = 200
+
+        self.__prepare_animation()
+
+        fig = plt.figure()
+        if dpi != None:
+            fig.set_dpi(dpi)
+        self.render_dpi = dpi
+        # draw off-screen whatever backend pyplot is using
+        canvas = FigureCanvasAgg(fig)
+
+        # the new figure shows nothing yet
+        self.drawn_slice_index = None
+        if self.persistent_artists == True:
+            self.__setup_persistent_figure(fig)
+
+        self.__start_prefetch(range(len(self.frame_schedule)))
+
+        progress = frameprofiler.FrameProgress(len(self.frame_schedule)) if print_frame_progress == True else None
+
+        writers = []
+        try:
+            for frame in range(len(self.frame_schedule)):
+                plt.figure(fig.number)
+                # paused frames reuse the buffer of the frame before
+                repeated = not self.__draw_frame(frame)
+                if not repeated:
+                    with self.__stage('draw'):
+                        canvas.draw()
+
+                if len(writers) == 0:
+                    width, height = canvas.get_width_height()
+                    for output in outputs:
+                        writers.append(self.__open_writer(output, width, height, fig.dpi))
+
+                self.profiled_frame = frame
+                with self.__stage('encode'):
+                    buffer = canvas.buffer_rgba()
+                    for writer in writers:
+                        writer.write_frame(buffer, repeated)
+
+                if progress != None:
+                    progress.update(frame + 1)
+        finally:
+            self.__stop_prefetch()
+            for writer in writers:
+                writer.close()
+            plt.close(fig)
+
+
+    def __open_writer(self, output: dict, width: int, height: int, dpi: float):
+        """
+        Create the writer of an output of stream_outputs.
+
+        output : dict
+            output as described in stream_outputs
+        width, height : int
+            size of the rendered frames in pixels
+        dpi : float
+            resolution of the rendered frames
+        """
+        size = None
+        if output.get('dpi') != None:
+            scale = output['dpi']/dpi
+            size = (max(1, round(width*scale)), max(1, round(height*scale)))
+
+        format = output['format']
+        if format == 'preview':
+            output['server'].set_interval(self.animation_interval)
+            return output['server'].get_writer(width, height, size)
+        if format == 'png':
+            return framewriters.PNGSequenceWriter(output['path'], width, height, size)
+        if format == 'thumbnails':
+            return framewriters.ThumbnailStripWriter(output['path'], width, height, output.get('every', 10), output.get('thumbnail_height', 120), output.get('columns'))
+
+        return framewriters.FFMpegPipeWriter(output['path'], width, height, 1000/self.animation_interval, format, output.get('encoder'), output.get('bitrate', 100000), size)
+
+
+    def preview(self, port: int = 8000, dpi: int = PREVIEW_DPI, outputs: Union[List[dict], None] = None, host: str = '127.0.0.1', buffer_frames: int = 8, provisional_levels: bool = True, wait: bool = False, print_frame_progress: bool = False):
+        """
+        Serve the frames over a local HTTP endpoint as they are rendered, to check the animation
+        in a browser without waiting for it to be encoded. The server is started before the data
+        is loaded and runs in a daemon thread while the frames are rendered in this one.
+        Unless the colour scales are already known, e.g. from a stats cache, finding them means
+        scanning every cube, which grows with the length of the animation. With provisional_levels
+        the first frames are drawn with the range of the first slice instead, so the first frame is
+        not held up, and the frames switch to the full range once a background scan has found it.
+        Returns the previewserver.PreviewServer, still serving the last frames; close it when done.
+
+        port : int (optional)
+            port to serve on, 0 picks a free one
+        dpi : int (optional)
+            resolution of the preview frames
+        outputs : Union[List[dict], None] (optional)
+            outputs to write from the same render as described in stream_outputs, e.g. the final mp4
+        host : str (optional)
+            address to listen on, the default only accepts connections from this machine
+        buffer_frames : int (optional)
+            latest frames kept for the browser
+        provisional_levels : bool (optional)
+            start from the colour scale of the first slice while the full one is found. Not used
+            when other outputs are written, so they always get the colour scale of the whole data.
+        wait : bool (optional)
+            keep serving once the render has finished until interrupted with Ctrl+C
+        print_frame_progress : bool (optional)
+            display the frame progress
+        """
+        import previewserver
+
+        server = previewserver.PreviewServer(host, port, buffer_frames)
+        server.start()
+        print(f'Previewing at {server.get_url()}', flush=True)
+
+        outputs = list(outputs) if outputs != None else []
+        self.provisional_min_max = provisional_levels == True and len(outputs) == 0
+        try:
+            self.stream_outputs([{'format': 'preview', 'server': server, 'dpi': dpi}] + outputs, print_frame_progress=print_frame_progress)
+        except BaseException:
+            server.close()
+            raise
+        finally:
+            self.provisional_min_max = False
+
+        if wait == True:
+            server.wait()
+        return server
+
+
+    def render_frames(self, frames: range, frame_dir: str, dpi: Union[int, None] = None, frame_hashes: Union[dict, None] = None, print_frame_progress: bool = False) -> None:
+        """
+        Render the requested frames off-screen and save each one as a png in frame_dir.
+        Used by the parallel, resumable and sharded renderers. The pyplot backend is left as it is.
+
+        frames : range
+            frame numbers to render, in increasing order
+        frame_dir : str
+            directory the frames are written to
+        dpi : Union[int, None] (optional)
+            resolution of the saved frames, defaults to the figure dpi
+        frame_hashes : Union[dict, None] (optional)
+            hash of each frame's inputs, written next to the frame once it is saved
+        print_frame_progress : bool (optional)
+            display the frame progress
+        """
+        _import_plotting()
+        fig = plt.figure()
+        self.render_dpi = dpi
+        # draw off-screen whatever backend pyplot is using
+        FigureCanvasAgg(fig)
+
+        # the new figure shows nothing yet
+        self.drawn_slice_index = None
+        if self.persistent_artists == True:
+            self.__setup_persistent_figure(fig)
+
+        self.__start_prefetch(frames)
+
+        progress = frameprofiler.FrameProgress(len(frames)) if print_frame_progress == True else None
+
+        try:
+            previous_path = None
+            for frame in frames:
+                path = os.path.join(frame_dir, FRAME_FILENAME.format(frame))
+                plt.figure(fig.number)
+                if self.__draw_frame(frame) or previous_path == None:
+                    self.profiled_frame = frame
+                    with self.__stage('save'):
+                        fig.savefig(path, dpi=dpi if dpi != None else 'figure')
+                else:
+                    # paused frames reuse the image of the frame before
+                    _link_or_copy(previous_path, path)
+                previous_path = path
+
+                if frame_hashes != None:
+                    _write_frame_hash(os.path.join(frame_dir, FRAME_HASH_FILENAME.format(frame)), frame_hashes[frame])
+
+                if progress != None:
+                    progress.update()
+        finally:
+            self.__stop_prefetch()
+            plt.close(fig)
+
+
+    def __get_style_hash(self, dpi: Union[int, None]) -> str:
+        """
+        Return a hash of everything that changes how every frame looks: the layout, colour scales,
+        titles, projections and drawing options. Called after __prepare_animation.
+
+        dpi : Union[int, None]
+            resolution of the saved frames
+        """
+        fig = plt.figure()
+        figure_size = fig.get_size_inches().tolist()
+        figure_dpi = fig.dpi
+        plt.close(fig)
+
+        projections = []
+        for n in range(1, self.fig_count + 1):
+            projection = self.__get_subplot_projection(n)
+            projections.append(projection.to_wkt() if projection != None else None)
+
+        style = {
+            'version': FRAME_HASH_VERSION,
+            'fig_dims': self.fig_dims,
+            'figure': [figure_size, figure_dpi, dpi],
+            'cmap': matplotlib.rcParams['image.cmap'],
+            'plot_method': self.plot_method,
+            'color_steps': self.plot_color_steps,
+            'min_vals': [float(val) for val in self.min_vals],
+            'max_vals': [float(val) for val in self.max_vals],
+            'subplot_titles': self.subplot_titles,
+            'projections': projections,
+            'coastlines': [self.coastlines, self.coastline_resolution],
+            'level_of_detail': [self.coarsen_method, self.points_per_pixel],
+            'persistent_artists': self.persistent_artists,
+        }
+        return hashlib.sha1(json.dumps(style, sort_keys=True).encode()).hexdigest()
+
+
+    def __get_frame_hash(self, frame: int, style_hash: str) -> str:
+        """
+        Return a hash of the inputs of a frame: the style, master title and the data and
+        coordinates of every subplot slice.
+
+        frame : int
+            frame number
+        style_hash : str
+            hash returned by __get_style_hash
+        """
+        key = hashlib.sha1(style_hash.encode())
+        key.update(self.__get_master_title(self.frame_schedule[frame]).encode())
+
+        for n in range(1, self.fig_count + 1):
+            data_to_plot = self.__get_subplot_data(frame, n)
+            for coord in data_to_plot.coords(dim_coords=True):
+                key.update(np.ascontiguousarray(coord.points).tobytes())
+
+            data = data_to_plot.data
+            key.update(f'|{data.shape}|{data.dtype}|'.encode())
+            key.update(np.ascontiguousarray(np.ma.getdata(data)).tobytes())
+            key.update(np.packbits(np.ma.getmaskarray(data)).tobytes())
+
+        return key.hexdigest()
+
+
+    def render_resumable(self, work_dir: str, path: str = None, format: str = 'gif', encoder: Union[str, None] = None, dpi: Union[int, None] = None, print_frame_progress: bool = False) -> dict:
+        """
+        Render the animation frame by frame into work_dir and save it to path. A hash of the inputs
+        of every frame (data, coordinates, titles, styling and layout) is stored next to it, so a run
+        that was interrupted resumes where it stopped, and rendering again after changing the data
+        or styling only redraws the frames whose inputs changed. The data of every frame is read
+        to hash it, even when none have to be redrawn.
+        Returns the number of frames rendered and reused.
+
+        work_dir : str
+            directory keeping the rendered frames between runs
+        path : str (optional)
+            new path is set if provided
+        format : str (optional)
+            save as 'gif' or 'mp4'
+        encoder : Union[str, None] (optional)
+            default chosen by FFMpegWriter is 'h264'
+        dpi : Union[int, None] (optional)
+            resolution of the frames, defaults to 200 for mp4 and the figure dpi for gif to match save_animation()
+        print_frame_progress : bool (optional)
+            display the frame progress
+        """
+        if not self.is_save_path_set(path):
+            raise Exception('save_path not set. Provide a path or use set_save_path().')
+
+        if dpi == None and format == 'mp4':
+            dpi = 200
+
+        self.__prepare_animation()
+        os.makedirs(work_dir, exist_ok=True)
+
+        style_hash = self.__get_style_hash(dpi)
+        slice_hashes = {}
+        frame_hashes = {}
+        stale_frames = []
+        for frame in range(len(self.frame_schedule)):
+            # paused frames show the same slice, so share its hash
+            slice_index = self.frame_schedule[frame]
+            if slice_index not in slice_hashes:
+                slice_hashes[slice_index] = self.__get_frame_hash(frame, style_hash)
+            frame_hashes[frame] = slice_hashes[slice_index]
+
+            frame_path = os.path.join(work_dir, FRAME_FILENAME.format(frame))
+            if not os.path.exists(frame_path) or _read_frame_hash(os.path.join(work_dir, FRAME_HASH_FILENAME.format(frame))) != frame_hashes[frame]:
+                stale_frames.append(frame)
+
+        # stale frames may be hard links shared with frames that are still valid, so
+        # they are removed rather than overwritten, along with frames of a longer animation
+        expired_paths = {os.path.join(work_dir, name.format(frame)) for frame in stale_frames for name in [FRAME_FILENAME, FRAME_HASH_FILENAME]}
+        for existing_path in glob.glob(os.path.join(work_dir, 'frame_*.*')):
+            index = os.path.basename(existing_path)[len('frame_'):].split('.')[0]
+            if index.isdigit() and int(index) >= len(self.frame_schedule):
+                expired_paths.add(existing_path)
+
+        for expired_path in expired_paths:
+            if os.path.exists(expired_path):
+                os.remove(expired_path)
+
+        if len(stale_frames) > 0:
+            self.render_frames(stale_frames, work_dir, dpi, frame_hashes, print_frame_progress)
+
+        self.__assemble_frames(work_dir, format, encoder)
+
+        return {'rendered': len(stale_frames), 'reused': len(self.frame_schedule) - len(stale_frames)}
+
+
+    def __assemble_frames(self, frame_dir: str, format: str, encoder: Union[str, None] = None) -> None:
+        """
+        Join the frames saved in frame_dir into the final animation at save_path.
+
+        frame_dir : str
+            directory containing the rendered frames
+        format : str
+            save as 'gif' or 'mp4'
+        encoder : Union[str, None]
+            default chosen by FFMpegWriter is 'h264'
+        """
+        # the encoder paths are read from matplotlib's settings
+        _import_plotting()
+        fps = 1000/self.animation_interval
+
+        if format == 'gif':
+            command = [
+                matplotlib.rcParams['animation.convert_path'],
+                '-delay', str(100/fps),
+                '-loop', '0',
+                os.path.join(frame_dir, 'frame_*.png'),
+                self.save_path
+            ]
+        elif format == 'mp4':
+            command = [
+                matplotlib.rcParams['animation.ffmpeg_path'],
+                '-y',
+                '-framerate', str(fps),
+                '-i', os.path.join(frame_dir, FRAME_FILENAME_PATTERN),
+                '-vcodec', encoder if encoder != None else matplotlib.rcParams['animation.codec'],
+                '-b:v', '100000k',
+                '-pix_fmt', 'yuv420p',
+                '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+                self.save_path
+            ]
+        else:
+            raise Exception(f"Unknown format '{format}'. Use 'gif' or 'mp4'.")
+
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+    def animate_parallel(self, path: str = None, format: str = 'gif', processes: Union[int, None] = None, encoder: Union[str, None] = None, dpi: Union[int, None] = None, print_frame_progress: bool = False) -> None:
+        """
+        Render the animation across a pool of worker processes and save it to path.
+        The frame range, including pauses, is split into contiguous chunks which the
+        workers render off-screen with Agg. The frames are then joined in order.
+
+        path : str (optional)
+            new path is set if provided
+        format : str (optional)
+            save as 'gif' or 'mp4'
+        processes : Union[int, None] (optional)
+            number of worker processes, defaults to the number of cpus
+        encoder : Union[str, None] (optional)
+            default chosen by FFMpegWriter is 'h264'
+        dpi : Union[int, None] (optional)
+            resolution of the frames, defaults to 200 for mp4 and the figure dpi for gif to match save_animation()
+        print_frame_progress : bool (optional)
+            display the frame progress
+        """
+        if not self.is_save_path_set(path):
+            raise Exception('save_path not set. Provide a path or use set_save_path().')
+
+        if processes == None:
+            processes = os.cpu_count()
+
+        if dpi == None and format == 'mp4':
+            dpi = 200
+
+        self.__prepare_animation()
+        frame_total = len(self.frame_schedule)
+
+        # several chunks per process so that fast workers pick up the slack
+        chunks = split_frames(frame_total, min(frame_total, processes*4))
+
+        frame_dir = tempfile.mkdtemp(prefix='iriscubeanimator_')
+        try:
+            tasks = [(chunk.start, chunk.stop, frame_dir, dpi) for chunk in chunks]
+            with workerpool.make_process_pool(processes, _init_render_worker, (self,)) as pool:
+                progress = frameprofiler.FrameProgress(frame_total) if print_frame_progress == True else None
+                frames_done = 0
+                for frames_rendered, records in pool.imap_unordered(_render_worker_frames, tasks):
+                    frames_done += frames_rendered
+                    if self.profiler != None:
+                        self.profiler.extend(records)
+                    if progress != None:
+                        progress.update(frames_done)
+
+            self.__assemble_frames(frame_dir, format, encoder)
+        finally:
+            shutil.rmtree(frame_dir, ignore_errors=True)
+
+
+    async def render_async(self, path: str = None, format: str = 'gif', encoder: Union[str, None] = None, dpi: Union[int, None] = None, service=None, progress=None) -> dict:
+        """
+        Render the animation and save it to path without blocking the event loop. The data is
+        loaded in a thread and the frames are rendered in the worker processes of an
+        asyncrender.RenderService, which bounds how many renders run at once. Cancelling the
+        task stops the render. Returns the path, number of frames and time taken.
+
+        path : str (optional)
+            new path is set if provided
+        format : str (optional)
+            save as 'gif' or 'mp4'
+        encoder : Union[str, None] (optional)
+            default chosen by FFMpegWriter is 'h264'
+        dpi : Union[int, None] (optional)
+            resolution of the frames, defaults to 200 for mp4 and the figure dpi for gif to match save_animation()
+        service : Union[asyncrender.RenderService, None] (optional)
+            service to render with, defaults to the one shared by the process
+        progress : Union[Callable, None] (optional)
+            called, or awaited, with a dict describing each step of the render
+        """
+        import asyncrender
+
+        if not self.is_save_path_set(path):
+            raise Exception('save_path not set. Provide a path or use set_save_path().')
+
+        if service == None:
+            service = asyncrender.get_default_service()
+
+        return await service.render(self, self.save_path, format=format, dpi=dpi, encoder=encoder, progress=progress)
+
+
+    def prepare(self) -> int:
+        """
+        Load the data and precompute everything needed before any frame can be drawn, e.g. in a
+        thread ahead of rendering the frames. Returns the number of frames, including pauses.
+        """
+        self.__prepare_animation()
+        return len(self.frame_schedule)
+
+
+    def get_frame_count(self) -> int:
+        """
+        Return the number of frames in the animation, including pauses.
+        """
+        self.__prepare_schedule()
+        return len(self.frame_schedule)
+
+
+    def get_shard_frames(self, shard: int, shard_count: int) -> range:
+        """
+        Return the frames rendered by a shard. The frames, including pauses, are split into
+        shard_count contiguous ranges of near equal length.
+
+        shard : int
+            shard number, 0 <= shard < shard_count
+        shard_count : int
+            number of shards the animation is split into
+        """
+        assert 0 <= shard < shard_count, f'shard must be between 0 and {shard_count - 1}. Received {shard}.'
+
+        frame_total = self.get_frame_count()
+        return split_frames(frame_total, min(frame_total, shard_count))[shard] if shard < frame_total else range(0)
+
+
+    def render_shard(self, frame_dir: str, shard: Union[int, None] = None, shard_count: Union[int, None] = None, frames: Union[range, None] = None, dpi: Union[int, None] = None, print_frame_progress: bool = False) -> range:
+        """
+        Render part of the animation into frame_dir, so that a long animation can be spread over
+        several processes or batch nodes. Give either a shard of shard_count or a range of frames.
+        Frames are saved under their number in the whole animation, with the pauses and master
+        titles of the whole animation, so the shards can be rendered in any order into one shared
+        directory or into separate ones and joined with merge_shards. Use the same dpi for every shard.
+        The frames are drawn off-screen in this process without changing the pyplot backend.
+        Returns the frames rendered.
+
+        frame_dir : str
+            directory the frames are written to
+        shard : Union[int, None] (optional)
+            shard number, 0 <= shard < shard_count
+        shard_count : Union[int, None] (optional)
+            number of shards the animation is split into
+        frames : Union[range, None] (optional)
+            frame numbers to render instead of a shard
+        dpi : Union[int, None] (optional)
+            resolution of the saved frames, defaults to the figure dpi
+        print_frame_progress : bool (optional)
+            display the frame progress
+        """
+        if (shard == None) == (frames == None):
+            raise Exception('Give either a shard and shard_count or a range of frames.')
+
+        if frames == None:
+            frames = self.get_shard_frames(shard, shard_count)
+
+        self.__prepare_animation()
+        frame_total = len(self.frame_schedule)
+        if frames.start < 0 or frames.stop > frame_total:
+            raise Exception(f'Frames {frames.start} to {frames.stop - 1} are outside the animation of {frame_total} frames.')
+
+        os.makedirs(frame_dir, exist_ok=True)
+        if len(frames) > 0:
+            self.render_frames(frames, frame_dir, dpi, print_frame_progress=print_frame_progress)
+
+        return frames
+
+
+    def merge_shards(self, frame_dirs: Union[str, List[str]], path: str = None, format: str = 'gif', encoder: Union[str, None] = None) -> None:
+        """
+        Join the frames rendered by render_shard into the final animation at path.
+        Raises an exception if any frame has not been rendered.
+
+        frame_dirs : Union[str, List[str]]
+            directory, or directories, the shards were rendered into
+        path : str (optional)
+            new path is set if provided
+        format : str (optional)
+            save as 'gif' or 'mp4'
+        encoder : Union[str, None] (optional)
+            default chosen by FFMpegWriter is 'h264'
+        """
+        if not self.is_save_path_set(path):
+            raise Exception('save_path not set. Provide a path or use set_save_path().')
+
+        if isinstance(frame_dirs, str):
+            frame_dirs = [frame_dirs]
+
+        frame_total = self.get_frame_count()
+        sources = []
+        missing = []
+        for frame in range(frame_total):
+            rendered = [os.path.join(frame_dir, FRAME_FILENAME.format(frame)) for frame_dir in frame_dirs]
+            rendered = [frame_path for frame_path in rendered if os.path.exists(frame_path)]
+            if len(rendered) == 0:
+                missing.append(frame)
+            else:
+                sources.append(rendered[0])
+
+        if len(missing) > 0:
+            raise Exception(f'{len(missing)} of {frame_total} frames have not been rendered, starting with frame {missing[0]}.')
+
+        # link the frames into a directory of their own, leaving out any others in the shard directories
+        merge_dir = tempfile.mkdtemp(prefix='iriscubeanimator_')
+        try:
+            for frame, source in enumerate(sources):
+                _link_or_copy(source, os.path.join(merge_dir, FRAME_FILENAME.format(frame)))
+            self.__assemble_frames(merge_dir, format, encoder)
+        finally:
+            shutil.rmtree(merge_dir, ignore_errors=True)
+
+
+    def __getstate__(self) -> dict:
+        """
+        Drop the figure and animation objects when sending the animator to another process.
+        """
+        state = self.__dict__.copy()
+        for key in ['animation', 'subplot_axes', 'data_artists', 'extra_artists', 'subplots_decorated', 'master_title_artist']:
+            state.pop(key, None)
+        # prefetch threads are not sent, the receiving animator starts its own
+        state['prefetcher'] = None
+        state['min_max_future'] = None
+        return state
@@ -1,10 +1,137 @@
 import iris
 import numpy as np
-import cartopy.crs as ccrs
-
-from typing import List, Tuple, Union
+import dask
+import dask.array as da
+import framestore
+
+from typing import Hashable, List, Tuple, Union, TYPE_CHECKING
+import collections
+import functools
+import hashlib
+import operator
+import threading
 import warnings
 
+if TYPE_CHECKING:
+    import cartopy.crs as ccrs
+
+# Default byte budget of a FrameCache
+DEFAULT_FRAME_CACHE_BYTES = 1024**3
+
+
+class FrameCache():
+    """
+    Least recently used cache of realised slices with a byte budget. Shared by the Cube handlers
+    of an animation so that the slice data held in memory stays within the budget, while
+    frames that are drawn again, e.g. when scrubbing or re-rendering, are not read again.
+    """
+    def __init__(self, max_bytes: int = DEFAULT_FRAME_CACHE_BYTES) -> None:
+        """
+        max_bytes : int (optional)
+            most bytes of slice data held at once, defaults to 1 GiB
+        """
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+
+    def get(self, key: Hashable):
+        """
+        Return the cached slice, or None if it is not cached.
+
+        key : Hashable
+            key the slice was stored under
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry == None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+
+    def put(self, key: Hashable, value, nbytes: int) -> None:
+        """
+        Store a slice, evicting the least recently used slices to stay within the budget.
+        Slices larger than the whole budget are not stored.
+
+        key : Hashable
+            key to store the slice under
+        value : object
+            realised slice
+        nbytes : int
+            size of the slice's data
+        """
+        if nbytes > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+
+            while self.entries and self.total_bytes + nbytes > self.max_bytes:
+                _, (_, evicted_bytes) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_bytes
+                self.evictions += 1
+
+            self.entries[key] = (value, nbytes)
+            self.total_bytes += nbytes
+
+
+    def get_stats(self) -> dict:
+        "Return the hit, miss and eviction counts and the bytes and slices held"
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'entries': len(self.entries),
+            }
+
+
+    def clear(self) -> None:
+        "Drop every slice and reset the counters"
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+    def __getstate__(self) -> dict:
+        """
+        Every process keeps its own slices, so only the budget is sent to other processes.
+        """
+        state = self.__dict__.copy()
+        state['entries'] = collections.OrderedDict()
+        state['total_bytes'] = 0
+        state.pop('lock')
+        return state
+
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+
+def _get_nbytes(data: np.ndarray) -> int:
+    "Bytes held by an array, including the mask of a masked array"
+    nbytes = data.nbytes
+    if np.ma.isMaskedArray(data) and data.mask is not np.ma.nomask:
+        nbytes += data.mask.nbytes
+    return nbytes
+
+
 class Cube():
     """
     Handler for a single cube. Can apply constraints and retrieve 
@@ -21,7 +148,10 @@ class Cube():
             a single iris.cube.Cube object
         """
 
-        self.cube = None
+        self.__cube = None
+        self.pending_constraints = []
+        self.loader = None
+        self.loader_cube_name = None
         self.dim_coord_names = []
         self.iterator_coord = None
         self.coord_points = {}
@@ -31,6 +161,13 @@ class Cube():
         self.y_plotting_coords = []
         self.make_iterator_prettier = False
         self.projection = None
+        self.source_paths = []
+        self.stats_cache = None
+        self.frame_store = None
+        self.frame_store_cache = None
+        self.frame_cache = None
+        # identifies this handler's slices in the frame cache, replaced whenever the slices change
+        self.frame_cache_token = object()
 
         # Overloaded constructor. 1 arg => cube provided. 2 args => loader and cube_name provided.
         if len(args) == 1:
@@ -52,27 +189,53 @@ class Cube():
 
         # if a loader and cube_name is provided
         if loader != None and cube_name != None:
-            self.cube = [cube for cube in loader.get_cube_list() if cube.standard_name == cube_name or cube.long_name == cube_name]
-
-            # check the number of cubes
-            if len(self.cube) == 1:
-                self.cube = self.cube[0]
-            elif len(self.cube) > 1:
-                warnings.warn("Multiple cubes with this name, taking the first one.")
-                self.cube = self.cube[0]
-            else:
-                raise Exception(f"No cubes found with this name: {cube_name}")
+            # the cube is only loaded once the constraints are known, so that they can be pushed into the load
+            self.loader = loader
+            self.loader_cube_name = cube_name
+            self.source_paths = loader.get_source_paths()
+            self.dim_coord_names = loader.get_coord_names(cube_name)
 
         elif cube != None:
-            # save the provided cube
-            self.cube = cube
+            # save the provided cube, its source file is unknown
+            self.__cube = cube
+            self.source_paths = None
+
+            # get names of all the dim-coordinates
+            self.dim_coord_names = []
+            for coord in self.__cube.coords():
+                self.dim_coord_names.append(coord.name())
         else:
             raise Exception("Please provide either a loader and valid cube_name or a single iris cube.")
 
-        # get names of all the dim-coordinates
-        self.dim_coord_names = []
-        for coord in self.cube.coords():
-            self.dim_coord_names.append(coord.name())
+
+    @property
+    def cube(self):
+        """
+        The iris cube with every constraint applied. Constraints set since the cube was last
+        used are applied together, in a single extract or in the load itself.
+        """
+        if self.__cube is None or self.pending_constraints:
+            self.__resolve_cube()
+        return self.__cube
+
+
+    def __resolve_cube(self) -> None:
+        """
+        Apply the pending constraints as one combined constraint. A cube that has not been
+        loaded yet is loaded with the constraint, so only the constrained cube is built.
+        """
+        plan = functools.reduce(operator.and_, self.pending_constraints) if self.pending_constraints else None
+
+        if self.__cube is None:
+            cube = self.loader.get_cube(self.loader_cube_name, plan)
+        else:
+            cube = self.__cube.extract(plan)
+
+        if cube is None:
+            raise Exception("No data matches the requested constraints.")
+
+        self.__cube = cube
+        self.pending_constraints = []
 
 
     def concatenate(self, new_cubes: List) -> None:
@@ -84,15 +247,24 @@ class Cube():
         """
         # Convert all provides cubes to iris.cube.Cube
         dummy_list = [self.cube]
+        source_paths = self.source_paths
         for new_cube in new_cubes:
             if isinstance(new_cube, Cube):
                 dummy_list.append(new_cube.get_cube())
+                if source_paths != None and new_cube.source_paths != None:
+                    source_paths = source_paths + new_cube.source_paths
             else:
                 dummy_list.append(new_cube)
+                # the source of a plain iris cube is unknown
+                source_paths = None
 
         # Try the concatenation procedure
         try:
-            self.cube = iris.cube.CubeList(dummy_list).concatenate()[0]
+            self.__cube = iris.cube.CubeList(dummy_list).concatenate()[0]
+            self.loader = None
+            self.source_paths = source_paths
+            self.frame_store = None
+            self.frame_cache_token = object()
             del dummy_list
         except:
             warnings.warn("Concatenation failed. Retaining the original cube.")
@@ -113,7 +285,11 @@ class Cube():
         constraint : object
             iris.Constraint object
         """
-        self.cube = self.cube.extract(constraint)
+        # applied together when the cube is next used, see the cube property
+        self.pending_constraints.append(constraint)
+        # any stored frames no longer match the cube
+        self.frame_store = None
+        self.frame_cache_token = object()
 
 
     def coord(self, coord_name: str) -> str:
@@ -239,12 +415,136 @@ class Cube():
         return self.cube
 
 
+    def copy(self) -> 'Cube':
+        """
+        Return a new handler of the same constrained cube. The copy shares the cube's data,
+        source files, caches and any statistics already found, but the iterator, axes and
+        projection are set on it afresh.
+        """
+        handler = Cube(self.cube)
+        handler.source_paths = self.source_paths
+        handler.stats_cache = self.stats_cache
+        handler.frame_store_cache = self.frame_store_cache
+        handler.frame_cache = self.frame_cache
+        if hasattr(self, 'max_val'):
+            handler.min_val = self.min_val
+            handler.max_val = self.max_val
+        return handler
+
+
+    def set_stats_cache(self, stats_cache) -> None:
+        """
+        Use an on-disk cache for the cube statistics. Only cubes loaded through an
+        IrisDataLoader can be cached, since the source file must be known.
+
+        stats_cache : statscache.StatsCache
+            cache to read from and write to
+        """
+        self.stats_cache = stats_cache
+
+
+    def get_fingerprint(self) -> str:
+        """
+        Return a hash of the cube's name, shape, units and coordinate points. Any
+        constraint applied to the cube changes its coordinates and so its fingerprint.
+        """
+        fingerprint = hashlib.sha1()
+        fingerprint.update(f'{self.get_cube_name()}|{self.cube.shape}|{self.cube.units}'.encode())
+        for coord in self.cube.coords():
+            fingerprint.update(f'|{coord.name()}|{coord.shape}|'.encode())
+            fingerprint.update(np.ascontiguousarray(coord.points).tobytes())
+        return fingerprint.hexdigest()
+
+
+    def __get_stats_cache_key(self) -> Union[str, None]:
+        """
+        Return the stats cache key, or None if the cube cannot be cached.
+        """
+        if self.stats_cache == None or not self.source_paths:
+            return None
+
+        return self.stats_cache.make_key(self.source_paths, self.get_cube_name(), self.get_fingerprint())
+
+
+    def __get_cached_stats(self) -> dict:
+        """
+        Return the statistics stored in the stats cache for this cube, if any.
+        """
+        key = self.__get_stats_cache_key()
+        if key == None:
+            return {}
+
+        stats = self.stats_cache.get(key)
+        return stats if stats != None else {}
+
+
+    def __put_cached_stats(self, stats: dict) -> None:
+        """
+        Store statistics in the stats cache, if there is one.
+        """
+        key = self.__get_stats_cache_key()
+        if key != None:
+            self.stats_cache.put(key, stats, self.source_paths)
+
+
+    def __get_filled_data(self):
+        """
+        Return the cube's data as floats with masked points set to NaN. Lazy data stays lazy.
+        """
+        if self.cube.has_lazy_data():
+            data = self.cube.lazy_data()
+            if not np.issubdtype(data.dtype, np.floating):
+                data = data.astype(np.float64)
+            return da.ma.filled(data, np.nan)
+
+        data = self.cube.data
+        if not np.issubdtype(data.dtype, np.floating):
+            data = data.astype(np.float64)
+        return np.ma.filled(data, np.nan)
+
+
     def __find_cube_min_max(self) -> None:
         """
-        Find and set the maximum and minimum values in the cube
+        Find and set the maximum and minimum values in the cube, ignoring masked and NaN values.
+        Lazy data is reduced chunk by chunk, with both reductions sharing a single pass over
+        the data, so the cube is never realised in memory.
+        """
+        stats = self.__get_cached_stats()
+        if 'min' in stats and 'max' in stats:
+            self.min_val = stats['min']
+            self.max_val = stats['max']
+            return
+
+        data = self.__get_filled_data()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            if isinstance(data, da.Array):
+                min_val, max_val = dask.compute(da.nanmin(data), da.nanmax(data))
+            else:
+                min_val, max_val = np.nanmin(data), np.nanmax(data)
+
+        if np.isnan(min_val) or np.isnan(max_val):
+            warnings.warn("The cube contains no valid data, min and max values are NaN.")
+
+        self.min_val = min_val
+        self.max_val = max_val
+        self.__put_cached_stats({'min': float(min_val), 'max': float(max_val)})
+
+
+    def get_cached_min_max(self) -> Union[Tuple[float, float], None]:
+        """
+        Return the min and max values of the cube's data if they are already known, found
+        earlier or held in the stats cache, without reading the data. Returns None otherwise.
         """
-        self.max_val = np.max(self.cube.data)
-        self.min_val = np.min(self.cube.data)
+        if not hasattr(self, 'max_val'):
+            stats = self.__get_cached_stats()
+            if 'min' not in stats or 'max' not in stats:
+                return None
+            self.min_val = stats['min']
+            self.max_val = stats['max']
+
+        return (self.min_val, self.max_val)
+
 
     def get_cube_min_max(self) -> Tuple[int, int]:
         """
@@ -254,8 +554,40 @@ class Cube():
             self.__find_cube_min_max()
             
         return (self.min_val, self.max_val)
-        
-    
+
+
+    def get_cube_percentiles(self, percentiles: List[float], bins: int = 10000) -> List[float]:
+        """
+        Return approximate percentiles of the cube's data, ignoring masked and NaN values.
+        They are read from a histogram built in one chunked pass, so are accurate to
+        (max - min)/bins.
+
+        percentiles : List[float]
+            requested percentiles, 0 <= percentile <= 100
+        bins : int (optional)
+            number of histogram bins
+        """
+        stats = self.__get_cached_stats()
+        cached = stats.get('percentiles', {})
+        if all(str(float(q)) in cached for q in percentiles):
+            return [cached[str(float(q))] for q in percentiles]
+
+        min_val, max_val = self.get_cube_min_max()
+        data = self.__get_filled_data()
+        if isinstance(data, da.Array):
+            counts, edges = da.histogram(data, bins=bins, range=(min_val, max_val))
+            counts = counts.compute()
+        else:
+            counts, edges = np.histogram(data[~np.isnan(data)], bins=bins, range=(min_val, max_val))
+
+        cumulative = np.concatenate([[0], np.cumsum(counts)]) / max(counts.sum(), 1)
+        values = [float(value) for value in np.interp(np.array(percentiles)/100, cumulative, edges)]
+
+        cached.update({str(float(q)): value for q, value in zip(percentiles, values)})
+        self.__put_cached_stats({'percentiles': cached})
+        return values
+
+
     ############################################################################
     ####        The following methods are used for the Animator class       ####
     ############################################################################
@@ -326,6 +658,8 @@ class Cube():
             list of desired y-axis cube coordinates for the plots
         """
         
+        self.frame_cache_token = object()
+
         # check the number of coords match the requested number of plots
         x_coords_length = len(x_coords)
         y_coords_length = len(y_coords)
@@ -371,7 +705,117 @@ class Cube():
         return next(self.slices[plot_counter])
 
 
-    def set_projection(self, projection: ccrs.Projection) -> None:
+    def get_slice(self, plot_counter: int, index: int):
+        """
+        Return the slice at the requested index of the requested slice list. Unlike
+        get_next_slice the slices can be requested in any order.
+
+        plot_counter : int
+            0 <= plot_counter < plot_count
+        index : int
+            0 <= index < number of slices, in the order cube.slices() would yield them
+        """
+        if self.frame_store != None:
+            return self.frame_store.get_slice(plot_counter, index)
+
+        if self.frame_cache == None:
+            return self.__slice_cube(plot_counter, index)
+
+        key = (self.frame_cache_token, plot_counter, index)
+        data_slice = self.frame_cache.get(key)
+        if data_slice is None:
+            data_slice = self.__slice_cube(plot_counter, index)
+            self.frame_cache.put(key, data_slice, _get_nbytes(data_slice.data))
+        return data_slice
+
+
+    def __slice_cube(self, plot_counter: int, index: int):
+        """
+        Slice the iris cube at the requested index of the requested slice list, see get_slice.
+        """
+        x_coord = self.x_plotting_coords[plot_counter]
+        y_coord = self.y_plotting_coords[plot_counter]
+
+        # the slices iterate over every dimension that is not plotted
+        plotted_dims = self.cube.coord_dims(x_coord) + self.cube.coord_dims(y_coord)
+        iterated_dims = [dim for dim in range(self.cube.ndim) if dim not in plotted_dims]
+        position = np.unravel_index(index, [self.cube.shape[dim] for dim in iterated_dims])
+
+        keys = [slice(None)]*self.cube.ndim
+        for dim, i in zip(iterated_dims, position):
+            keys[dim] = int(i)
+
+        # slices() puts the plotting dimensions in the requested order
+        return next(self.cube[tuple(keys)].slices([x_coord, y_coord]))
+
+
+    def create_frame_store(self, directory: Union[str, None] = None) -> None:
+        """
+        Copy the plotting data into a frame-major store. Afterwards get_slice and get_frame
+        index the store directly instead of slicing the iris cube for every frame.
+
+        directory : Union[str, None] (optional)
+            memory-map the store from .npy files in this directory instead of holding it in memory.
+            If no directory is given and a frame store cache is set, the store is read from or written to the cache.
+        """
+        self.frame_store = None
+        if self.frame_store_cache != None and directory == None:
+            self.frame_store = self.frame_store_cache.get_store(self)
+        else:
+            self.frame_store = framestore.FrameStore(self, directory)
+
+
+    def set_frame_cache(self, frame_cache: Union[FrameCache, None]) -> None:
+        """
+        Keep the slices returned by get_slice in memory, within the byte budget of the cache,
+        so that slices requested again are not read again. Slices are realised before they are
+        cached. Not used once a frame store has been created, as that already holds every slice.
+
+        frame_cache : Union[FrameCache, None]
+            cache, often shared with other handlers, or None to stop caching
+        """
+        self.frame_cache = frame_cache
+
+
+    def set_frame_store_cache(self, frame_store_cache) -> None:
+        """
+        Keep the frame store in an on-disk cache so later runs on the same data and constraints
+        reuse it. Only cubes loaded through a loader can be cached, since the source files must be known.
+
+        frame_store_cache : framestore.FrameStoreCache
+            cache to read from and write to
+        """
+        self.frame_store_cache = frame_store_cache
+
+
+    def get_frame(self, plot_counter: int, index: int) -> np.ndarray:
+        """
+        Return the data of the slice at the requested index as an array.
+
+        plot_counter : int
+            0 <= plot_counter < plot_count
+        index : int
+            0 <= index < number of slices
+        """
+        if self.frame_store != None:
+            return self.frame_store.get_frame(plot_counter, index)
+
+        return self.get_slice(plot_counter, index).data
+
+
+    def __getstate__(self) -> dict:
+        """
+        Slice generators cannot be pickled, so drop them when sending the handler to another process.
+        The cube is resolved first so that other processes do not need the loader.
+        """
+        self.cube
+        state = self.__dict__.copy()
+        state.pop('slices', None)
+        state['loader'] = None
+        return state
+
+
+    def set_projection(self, projection: 'ccrs.Projection') -> None:
         """
         Set a desired cartopy projection
 
@@ -381,7 +825,7 @@ class Cube():
         self.projection = projection
 
     
-    def get_projection(self) -> Union[ccrs.Projection, None]:
+    def get_projection(self) -> Union['ccrs.Projection', None]:
         """
         Returns the projection. Used only by the Animator class.
         """
@@ -1,14 +1,132 @@
 import iris
+import glob
+import warnings
+
+from typing import List, Union
+
+try:
+    import netCDF4
+except ImportError:
+    netCDF4 = None
+
+# Leading bytes of netCDF classic, 64-bit offset, 64-bit data and netCDF-4 (HDF5) files
+NETCDF_SIGNATURES = [b'CDF\x01', b'CDF\x02', b'CDF\x05', b'\x89HDF\r\n\x1a\n']
+
+# Attributes through which a CF data variable refers to its supporting variables
+NETCDF_REFERENCE_ATTRIBUTES = ['coordinates', 'bounds', 'climatology', 'grid_mapping', 'ancillary_variables', 'cell_measures', 'formula_terms']
+
+# Name of the coordinate iris derives from each standard name of a dimensionless vertical coordinate with formula_terms
+NETCDF_DERIVED_COORD_NAMES = {
+    'atmosphere_sigma_coordinate': 'air_pressure',
+    'atmosphere_hybrid_height_coordinate': 'altitude',
+    'atmosphere_hybrid_sigma_pressure_coordinate': 'air_pressure',
+    'ocean_sigma_z_coordinate': 'sea_surface_height_above_reference_ellipsoid',
+    'ocean_sigma_coordinate': 'sea_surface_height_above_reference_ellipsoid',
+    'ocean_s_coordinate': 'sea_surface_height_above_reference_ellipsoid',
+    'ocean_s_coordinate_g1': 'sea_surface_height_above_reference_ellipsoid',
+    'ocean_s_coordinate_g2': 'sea_surface_height_above_reference_ellipsoid',
+}
+
+
+def is_netcdf_file(path: str) -> bool:
+    """
+    Return True if the path is a single netCDF file.
+
+    path : str
+        path to file
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(8)
+    except OSError:
+        return False
+    return any(header.startswith(signature) for signature in NETCDF_SIGNATURES)
+
+
+def read_netcdf_variables(path: str) -> List[dict]:
+    """
+    Read the data variables of a netCDF file from its header, without reading any data.
+    Coordinate, bounds, grid mapping and other supporting variables are left out, as iris
+    does not load them as cubes. Returns a dict per variable with the keys var_name,
+    standard_name, long_name, dimensions, shape and coord_names, the names iris gives the
+    variable's coordinates, including those it derives from formula_terms such as altitude.
+
+    path : str
+        path to a netCDF file
+    """
+    variables = []
+    with netCDF4.Dataset(path, 'r') as dataset:
+        # names referred to by other variables, e.g. "coordinates: lat lon" or "area: cell_area"
+        referenced = set(dataset.dimensions)
+        for variable in dataset.variables.values():
+            for attribute in NETCDF_REFERENCE_ATTRIBUTES:
+                value = getattr(variable, attribute, None)
+                if isinstance(value, str):
+                    referenced.update(token for token in value.split() if not token.endswith(':'))
+
+        def coord_name(name: str) -> str:
+            "Name iris gives the coordinate read from the variable"
+            coord = dataset.variables[name]
+            return getattr(coord, 'standard_name', None) or getattr(coord, 'long_name', None) or name
+
+        def derived_coord_names(name: str) -> List[str]:
+            "Name of the coordinate iris derives from the variable, e.g. altitude from hybrid height"
+            coord = dataset.variables[name]
+            standard_name = getattr(coord, 'standard_name', None)
+            if getattr(coord, 'formula_terms', None) == None or standard_name not in NETCDF_DERIVED_COORD_NAMES:
+                return []
+            return [NETCDF_DERIVED_COORD_NAMES[standard_name]]
+
+        for name, variable in dataset.variables.items():
+            if name in referenced:
+                continue
+
+            coords = [dim for dim in variable.dimensions if dim in dataset.variables]
+            coords += [token for token in getattr(variable, 'coordinates', '').split() if token in dataset.variables]
+            coord_names = [coord_name(coord) for coord in dict.fromkeys(coords)]
+            coord_names += [derived for coord in dict.fromkeys(coords) for derived in derived_coord_names(coord)]
+
+            variables.append({
+                'var_name': name,
+                'standard_name': getattr(variable, 'standard_name', None),
+                'long_name': getattr(variable, 'long_name', None),
+                'dimensions': list(variable.dimensions),
+                'shape': list(variable.shape),
+                'coord_names': list(dict.fromkeys(coord_names)),
+            })
+
+    return variables
+
 
 class IrisDataLoader():
     """
     Loads Iris cubes from file and reads phenomenon names
     """
-    def __init__(self, path: str) -> None:
+    def __init__(self, path: str, metadata_only: bool = False) -> None:
+        """
+        path : str
+            path to file
+        metadata_only : bool (optional)
+            only read the names of the cubes from the file headers and load a cube when it is
+            requested with get_cube. Much faster for files holding many variables. Headers are
+            read directly for netCDF files, other formats fall back to loading every cube.
+        """
         self.__set_path(path)
-        self.__read_cubes()
+        self.metadata_only = metadata_only
+        self.cube_list = None
+        self.loaded_cubes = {}
+
+        if metadata_only and netCDF4 != None and is_netcdf_file(path):
+            self.__scan_headers()
+        else:
+            if metadata_only and netCDF4 == None:
+                warnings.warn("netCDF4 is not installed, loading every cube to read their names.")
+            self.__read_cubes()
+            self.__index_cubes()
+
         self.__find_cube_standard_names()
         self.__find_cube_long_names()
+        self.__build_name_index()
 
 
     def __set_path(self, path: str) -> None:
@@ -26,23 +144,116 @@ class IrisDataLoader():
         self.cube_list = iris.load(self.path)
 
 
+    def __index_cubes(self) -> None:
+        "Describe the loaded cubes in the same form as the header scan"
+        self.cube_index = []
+        for i, cube in enumerate(self.cube_list):
+            self.cube_index.append({
+                'var_name': cube.var_name,
+                'standard_name': cube.standard_name,
+                'long_name': cube.long_name,
+                'dimensions': [coord.name() for coord in cube.dim_coords],
+                'shape': list(cube.shape),
+                'coord_names': [coord.name() for coord in cube.coords()],
+            })
+            self.loaded_cubes[i] = cube
+
+
+    def __scan_headers(self) -> None:
+        "Describe the cubes in the file from its header alone"
+        self.cube_index = read_netcdf_variables(self.path)
+
+
     def __find_cube_standard_names(self) -> None:
         "Collect the standard names and count of the cubes"
         self.cube_standard_names = []
         self.cube_count = 0
-        for cube in self.cube_list:
-            self.cube_standard_names.append(cube.standard_name)
+        for entry in self.cube_index:
+            self.cube_standard_names.append(entry['standard_name'])
             self.cube_count += 1
 
 
     def __find_cube_long_names(self) -> None:
         "Collect the long names"
         self.cube_long_names = []
-        for cube in self.cube_list:
-            self.cube_long_names.append(cube.long_name)
+        for entry in self.cube_index:
+            self.cube_long_names.append(entry['long_name'])
+
+
+    def __build_name_index(self) -> None:
+        "Map every standard and long name to the positions of the cubes carrying it"
+        self.name_index = {}
+        for i, entry in enumerate(self.cube_index):
+            for name in dict.fromkeys([entry['standard_name'], entry['long_name']]):
+                if name != None:
+                    self.name_index.setdefault(name, []).append(i)
+
+
+    def __load_cube(self, i: int):
+        """
+        Load the i'th cube of the index, reading only that variable from the file.
+
+        i : int
+            position of the cube in the index
+        """
+        if i not in self.loaded_cubes:
+            entry = self.cube_index[i]
+            self.loaded_cubes[i] = iris.load_cube(self.path, iris.NameConstraint(var_name=entry['var_name']))
+        return self.loaded_cubes[i]
+
+
+    def __find_cube(self, cube_name: str) -> int:
+        """
+        Return the position in the index of the cube whose standard name or long name is cube_name.
+
+        cube_name : str
+            name of the desired cube
+        """
+        matches = self.name_index.get(cube_name, [])
+        if len(matches) == 0:
+            raise Exception(f"No cubes found with this name: {cube_name}")
+        elif len(matches) > 1:
+            warnings.warn("Multiple cubes with this name, taking the first one.")
+
+        return matches[0]
+
+
+    def get_cube(self, cube_name: str, constraint: Union[iris.Constraint, None] = None):
+        """
+        Return the cube whose standard name or long name is cube_name.
+
+        cube_name : str
+            name of the desired cube
+        constraint : Union[iris.Constraint, None] (optional)
+            constraint applied while loading, so only the constrained cube is built.
+            Returns None if nothing matches the constraint.
+        """
+        i = self.__find_cube(cube_name)
+        if constraint == None:
+            return self.__load_cube(i)
+
+        if i in self.loaded_cubes:
+            return self.loaded_cubes[i].extract(constraint)
+
+        cubes = iris.load(self.path, iris.NameConstraint(var_name=self.cube_index[i]['var_name']) & constraint)
+        return cubes[0] if len(cubes) > 0 else None
+
+
+    def get_coord_names(self, cube_name: str) -> List[str]:
+        """
+        Return the names of the coordinates of the cube, without loading it.
+
+        cube_name : str
+            name of the desired cube
+        """
+        return self.cube_index[self.__find_cube(cube_name)]['coord_names']
+
 
-        
     def get_cube_list(self) -> list:
+        if self.cube_list == None:
+            # iris.cube pulls in cartopy, so it is only imported once cubes are built
+            import iris.cube
+            self.cube_list = iris.cube.CubeList(self.__load_cube(i) for i in range(self.cube_count))
         return self.cube_list
 
 
@@ -53,3 +264,7 @@ class IrisDataLoader():
     def get_cube_count(self) -> int:
         return self.cube_count
 
+
+    def get_source_paths(self) -> List[str]:
+        "Return the files the cubes are loaded from"
+        return sorted(glob.glob(self.path)) if glob.has_magic(self.path) else [self.path]
@@ -0,0 +1,348 @@
+"""
+Serve the frames of an animation over a local HTTP endpoint as they are rendered, so the
+animation can be checked in a browser before it has finished rendering or encoding.
+
+    animator.preview(port=8000, wait=True)
+
+then open http://127.0.0.1:8000/ in a browser. The endpoints are:
+
+    /         page showing the stream and the render progress
+    /stream   the frames as a multipart stream, MJPEG or PNG, which browsers show in an <img>
+    /frame    the latest frame as a single image
+    /status   frames rendered so far and whether the render has finished, as json
+
+Only the last few frames are kept, so memory use does not grow with the length of the animation.
+"""
+import collections
+import http.server
+import io
+import json
+import threading
+import time
+
+import framewriters
+
+from typing import Tuple, Union
+
+# Separates the frames of the multipart stream
+STREAM_BOUNDARY = 'iriscubeanimatorframe'
+
+# Image formats the frames can be served in, with their content type
+IMAGE_FORMATS = {'jpeg': 'image/jpeg', 'png': 'image/png'}
+
+# Page served at / showing the stream and the render progress
+PREVIEW_PAGE = '''<!DOCTYPE html>
+<html>
+<head><title>Animation preview</title></head>
+<body style="margin: 0; background: #222; color: #ddd; font-family: sans-serif; text-align: center">
+<img src="/stream" style="max-width: 100%; margin-top: 1em; background: #fff">
+<p id="status">waiting for the first frame</p>
+<script>
+async function poll() {
+    const status = await (await fetch('/status')).json();
+    document.getElementById('status').textContent = status.frames + ' frames rendered' + (status.finished ? ', finished' : '');
+    if (!status.finished) setTimeout(poll, 500);
+}
+poll();
+</script>
+</body>
+</html>
+'''
+
+
+class _PreviewRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Handles the requests of a PreviewServer, each in its own thread.
+    """
+    def do_GET(self) -> None:
+        preview = self.server.preview
+        path = self.path.split('?')[0]
+        try:
+            if path == '/':
+                self.__send_body(PREVIEW_PAGE.encode(), 'text/html; charset=utf-8')
+            elif path == '/status':
+                self.__send_body(json.dumps(preview.get_status()).encode(), 'application/json')
+            elif path == '/frame':
+                frame, image = preview.wait_for_frame(None)
+                if image == None:
+                    self.send_error(404, 'No frame has been rendered')
+                else:
+                    self.__send_body(image, preview.content_type)
+            elif path == '/stream':
+                self.__send_stream(preview)
+            else:
+                self.send_error(404)
+        except (BrokenPipeError, ConnectionResetError):
+            # the browser closed the page
+            pass
+
+
+    def __send_body(self, body: bytes, content_type: str) -> None:
+        "Send a complete response"
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def __send_stream(self, preview: 'PreviewServer') -> None:
+        """
+        Send the frames as a multipart stream, starting from the latest one, no faster than the
+        animation plays. A client that falls behind skips to the oldest frame still kept.
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={STREAM_BOUNDARY}')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+
+        next_frame = None
+        while True:
+            frame, image = preview.wait_for_frame(next_frame)
+            if image == None:
+                return
+
+            sent = time.perf_counter()
+            self.wfile.write(f'--{STREAM_BOUNDARY}\r\nContent-Type: {preview.content_type}\r\nContent-Length: {len(image)}\r\n\r\n'.encode())
+            self.wfile.write(image)
+            self.wfile.write(b'\r\n')
+            self.wfile.flush()
+            next_frame = frame + 1
+
+            delay = preview.interval/1000 - (time.perf_counter() - sent)
+            if delay > 0:
+                time.sleep(delay)
+
+
+    def log_message(self, format: str, *args) -> None:
+        "Keep the requests out of the render's output"
+        pass
+
+
+class PreviewServer():
+    """
+    Local HTTP server showing the frames of an animation as they are rendered. It runs in a
+    daemon thread while the frames are rendered in the calling thread, and keeps a ring buffer
+    of the latest frames, already encoded, for the clients to read.
+    """
+    def __init__(self, host: str = '127.0.0.1', port: int = 8000, buffer_frames: int = 8, image_format: str = 'jpeg', quality: int = 80) -> None:
+        """
+        host : str (optional)
+            address to listen on, the default only accepts connections from this machine
+        port : int (optional)
+            port to listen on, 0 picks a free one
+        buffer_frames : int (optional)
+            latest frames kept for the clients
+        image_format : str (optional)
+            'jpeg' or 'png', jpeg frames are smaller and faster to encode
+        quality : int (optional)
+            jpeg quality, 1 to 95
+        """
+        assert buffer_frames >= 1, f'buffer_frames must be at least 1. Received {buffer_frames}.'
+        assert image_format in IMAGE_FORMATS, f'image_format must be one of {list(IMAGE_FORMATS)}. Received {image_format}.'
+
+        self.address = (host, port)
+        self.image_format = image_format
+        self.content_type = IMAGE_FORMATS[image_format]
+        self.quality = quality
+        self.frames = collections.deque(maxlen=buffer_frames)
+        self.frame_count = 0
+        self.finished = False
+        self.closed = False
+        self.condition = threading.Condition()
+        # ms between frames of the stream, set from the animation
+        self.interval = 0
+        self.httpd = None
+        self.thread = None
+
+
+    def start(self) -> None:
+        """
+        Start serving in a daemon thread, so that it never keeps the process alive.
+        """
+        if self.httpd != None:
+            return
+
+        self.httpd = http.server.ThreadingHTTPServer(self.address, _PreviewRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.preview = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='preview-server', daemon=True)
+        self.thread.start()
+
+
+    def get_url(self) -> str:
+        "Return the address of the preview page"
+        host, port = self.httpd.server_address[:2] if self.httpd != None else self.address
+        return f'http://{host}:{port}/'
+
+
+    def set_interval(self, interval: float) -> None:
+        """
+        Set the time between frames of the stream.
+
+        interval : float
+            ms between frames, 0 sends them as fast as they are rendered
+        """
+        self.interval = interval
+
+
+    def get_writer(self, width: int, height: int, size: Union[Tuple[int, int], None] = None) -> 'PreviewWriter':
+        """
+        Return a writer publishing frames to this server, for Animator.stream_outputs.
+
+        width, height : int
+            size of every frame in pixels
+        size : Union[Tuple[int, int], None] (optional)
+            width and height of the served images if the frames are to be resized
+        """
+        return PreviewWriter(self, width, height, size)
+
+
+    def reset(self) -> None:
+        "Drop the frames of a previous render before starting a new one"
+        with self.condition:
+            self.frames.clear()
+            self.frame_count = 0
+            self.finished = False
+            self.condition.notify_all()
+
+
+    def publish(self, image: bytes) -> None:
+        """
+        Add an encoded frame to the ring buffer, dropping the oldest one if it is full.
+
+        image : bytes
+            frame encoded in the image format of the server
+        """
+        with self.condition:
+            self.frames.append((self.frame_count, image))
+            self.frame_count += 1
+            self.condition.notify_all()
+
+
+    def finish(self) -> None:
+        "Mark the render as finished, ending the streams once they have sent the frames kept"
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+
+    def wait_for_frame(self, frame: Union[int, None]) -> Tuple[Union[int, None], Union[bytes, None]]:
+        """
+        Wait until a frame is available and return its number and image. Returns (None, None)
+        once the render has finished and there are no frames left to send.
+
+        frame : Union[int, None]
+            frame wanted, the oldest kept if it has been dropped. None for the latest frame.
+        """
+        with self.condition:
+            while True:
+                if len(self.frames) > 0:
+                    oldest = self.frames[0][0]
+                    newest = self.frames[-1][0]
+                    if frame == None:
+                        return self.frames[-1]
+                    if frame <= newest:
+                        return self.frames[max(frame, oldest) - oldest]
+
+                if self.finished or self.closed:
+                    return (None, None)
+                # wake up now and then to notice the server closing
+                self.condition.wait(1)
+
+
+    def get_status(self) -> dict:
+        "Return the number of frames rendered so far and whether the render has finished"
+        with self.condition:
+            return {'frames': self.frame_count, 'finished': self.finished}
+
+
+    def wait(self) -> None:
+        """
+        Keep serving until interrupted with Ctrl+C, e.g. to look at the finished animation
+        from a script, then close the server.
+        """
+        try:
+            while self.thread != None and self.thread.is_alive():
+                self.thread.join(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+
+    def close(self) -> None:
+        "Stop serving"
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+        if self.httpd != None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+            self.thread = None
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class PreviewWriter():
+    """
+    Encodes frames and publishes them to a PreviewServer, with the same interface as the other
+    frame writers. Repeated frames are published again without being encoded.
+    """
+    def __init__(self, server: PreviewServer, width: int, height: int, size: Union[Tuple[int, int], None] = None) -> None:
+        """
+        server : PreviewServer
+            server the frames are published to
+        width, height : int
+            size of every frame in pixels
+        size : Union[Tuple[int, int], None] (optional)
+            width and height of the served images if the frames are to be resized
+        """
+        self.server = server
+        self.frame_size = (width, height)
+        self.size = size
+        self.image = None
+        server.reset()
+
+
+    def write_frame(self, buffer, repeated: bool = False) -> None:
+        """
+        Write a single frame.
+
+        buffer : buffer-like
+            width*height*4 bytes of RGBA data
+        repeated : bool (optional)
+            the frame is the same as the one before, e.g. during a pause
+        """
+        if not repeated or self.image == None:
+            image = framewriters.frame_to_image(buffer, self.frame_size, self.size)
+            encoded = io.BytesIO()
+            if self.server.image_format == 'jpeg':
+                image.convert('RGB').save(encoded, 'JPEG', quality=self.server.quality)
+            else:
+                image.save(encoded, 'PNG', compress_level=1)
+            self.image = encoded.getvalue()
+
+        self.server.publish(self.image)
+
+
+    def close(self) -> None:
+        self.server.finish()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        self.close()
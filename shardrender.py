@@ -0,0 +1,117 @@
+"""
+Render one animation across several processes or batch nodes, then join the pieces.
+
+The animation is described by a setup module: a python file defining make_animator(), which
+builds and returns the Animator. Every shard runs the same setup module, renders its own range
+of frames into a frame directory and exits. Once every shard has finished, merge joins the
+frames into the final gif or mp4.
+
+Usage:
+    python shardrender.py render setup.py frames/ --shard 3/8 --dpi 200
+    python shardrender.py render setup.py frames/ --frames 100-199 --dpi 200
+    python shardrender.py merge setup.py frames/ --output animation.mp4 --format mp4
+    python shardrender.py info setup.py --shards 8
+"""
+import argparse
+import importlib.util
+import os
+import sys
+
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import matplotlib
+matplotlib.use('Agg')
+import iriscubeanimator as ica
+
+
+def load_animator(setup_path: str) -> ica.Animator:
+    """
+    Build the animator described by a setup module.
+
+    setup_path : str
+        python file defining make_animator()
+    """
+    spec = importlib.util.spec_from_file_location('shardrender_setup', setup_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    if not hasattr(module, 'make_animator'):
+        raise Exception(f'{setup_path} does not define make_animator()')
+
+    return module.make_animator()
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    "Parse '3/8' into (3, 8)"
+    shard, shard_count = value.split('/')
+    return (int(shard), int(shard_count))
+
+
+def parse_frames(value: str) -> range:
+    "Parse '100-199' into range(100, 200)"
+    first, last = value.split('-')
+    return range(int(first), int(last) + 1)
+
+
+def render(args: argparse.Namespace) -> None:
+    "Render a shard or range of frames"
+    animator = load_animator(args.setup)
+    if args.shard != None:
+        frames = animator.render_shard(args.frame_dir, shard=args.shard[0], shard_count=args.shard[1], dpi=args.dpi, print_frame_progress=args.progress)
+    else:
+        frames = animator.render_shard(args.frame_dir, frames=args.frames, dpi=args.dpi, print_frame_progress=args.progress)
+
+    print(f'rendered frames {frames.start} to {frames.stop - 1} into {args.frame_dir}')
+
+
+def merge(args: argparse.Namespace) -> None:
+    "Join the rendered frames into the final animation"
+    animator = load_animator(args.setup)
+    animator.merge_shards(args.frame_dir, args.output, args.format, args.encoder)
+    print(f'saved {args.output}')
+
+
+def info(args: argparse.Namespace) -> None:
+    "Print the frames of every shard"
+    animator = load_animator(args.setup)
+    print(f'{animator.get_frame_count()} frames')
+    for shard in range(args.shards):
+        frames = animator.get_shard_frames(shard, args.shards)
+        print(f'shard {shard}/{args.shards}: frames {frames.start} to {frames.stop - 1}')
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Render an animation in shards and merge them.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    render_parser = commands.add_parser('render', help='render a shard or range of frames')
+    render_parser.add_argument('setup', help='python file defining make_animator()')
+    render_parser.add_argument('frame_dir', help='directory the frames are written to')
+    selection = render_parser.add_mutually_exclusive_group(required=True)
+    selection.add_argument('--shard', type=parse_shard, help='shard k of N, e.g. 3/8, counting from 0')
+    selection.add_argument('--frames', type=parse_frames, help='first and last frame, e.g. 100-199')
+    render_parser.add_argument('--dpi', type=int, default=None, help='resolution of the frames, the same for every shard')
+    render_parser.add_argument('--progress', action='store_true', help='display the frame progress')
+    render_parser.set_defaults(function=render)
+
+    merge_parser = commands.add_parser('merge', help='join the rendered frames into the animation')
+    merge_parser.add_argument('setup', help='python file defining make_animator()')
+    merge_parser.add_argument('frame_dir', nargs='+', help='directories the shards were rendered into')
+    merge_parser.add_argument('--output', required=True, help='path of the animation')
+    merge_parser.add_argument('--format', choices=['gif', 'mp4'], default='gif')
+    merge_parser.add_argument('--encoder', default=None, help='video codec for mp4')
+    merge_parser.set_defaults(function=merge)
+
+    info_parser = commands.add_parser('info', help='print the frames of every shard')
+    info_parser.add_argument('setup', help='python file defining make_animator()')
+    info_parser.add_argument('--shards', type=int, default=1, help='number of shards')
+    info_parser.set_defaults(function=info)
+
+    args = parser.parse_args(argv)
+    args.function(args)
+
+
+if __name__ == '__main__':
+    main()
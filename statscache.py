@@ -0,0 +1,165 @@
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from typing import List, Union
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, where concurrent writers are not locked out
+    fcntl = None
+
+class StatsCache():
+    """
+    On-disk cache of cube statistics (min, max and percentiles) so that repeat renders
+    of the same data can skip the full data scan.
+    """
+    def __init__(self, cache_path: str = None, max_entries: int = 1000) -> None:
+        """
+        cache_path : str (optional)
+            path of the json file holding the cache, defaults to ~/.cache/iriscubeanimator/stats.json
+        max_entries : int (optional)
+            maximum number of cached cubes. The least recently stored entries are evicted first.
+        """
+        if cache_path == None:
+            cache_path = os.path.join(os.path.expanduser('~'), '.cache', 'iriscubeanimator', 'stats.json')
+
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+
+
+    @staticmethod
+    def make_key(source_paths: List[str], cube_name: str, fingerprint: str) -> str:
+        """
+        Build the cache key for a cube. The modification time and size of every source
+        file are part of the key so that edited files are never served stale statistics.
+
+        source_paths : List[str]
+            files the cube was loaded from
+        cube_name : str
+            name of the cube
+        fingerprint : str
+            hash describing the constrained cube, see iriscubehandler.Cube.get_fingerprint
+        """
+        key = hashlib.sha1()
+        for path in sorted(source_paths):
+            stat = os.stat(path)
+            key.update(f'{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|'.encode())
+        key.update(f'{cube_name}|{fingerprint}'.encode())
+        return key.hexdigest()
+
+
+    def __read(self) -> dict:
+        "Read the cache file"
+        try:
+            with open(self.cache_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+
+    @contextlib.contextmanager
+    def __locked(self):
+        """
+        Hold a lock on the cache file while reading and rewriting it, so that processes sharing
+        the cache do not overwrite each other's entries.
+        """
+        cache_dir = os.path.dirname(os.path.abspath(self.cache_path))
+        os.makedirs(cache_dir, exist_ok=True)
+
+        with open(self.cache_path + '.lock', 'w') as lock_file:
+            if fcntl != None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl != None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+    def __write(self, entries: dict) -> None:
+        "Atomically replace the cache file"
+        cache_dir = os.path.dirname(os.path.abspath(self.cache_path))
+        os.makedirs(cache_dir, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.cache_path)
+
+
+    def __evict(self, entries: dict) -> None:
+        "Remove the least recently stored entries until the cache is within max_entries"
+        excess = len(entries) - self.max_entries
+        if excess > 0:
+            oldest = sorted(entries, key=lambda key: entries[key]['last_used'])[:excess]
+            for key in oldest:
+                del entries[key]
+
+
+    def get(self, key: str) -> Union[dict, None]:
+        """
+        Return the cached statistics for the key, or None if nothing is cached. Reading does
+        not rewrite the cache file.
+
+        key : str
+            key returned by make_key
+        """
+        entries = self.__read()
+        if key not in entries:
+            return None
+
+        return entries[key]['stats']
+
+
+    def put(self, key: str, stats: dict, source_paths: List[str] = None) -> None:
+        """
+        Add statistics to the cache, merging with anything already stored under the key.
+
+        key : str
+            key returned by make_key
+        stats : dict
+            statistics to store, e.g. {'min': 0.0, 'max': 1.0}
+        source_paths : List[str] (optional)
+            files the statistics were computed from, used by invalidate()
+        """
+        if source_paths == None:
+            source_paths = []
+
+        with self.__locked():
+            entries = self.__read()
+            entry = entries.get(key, {'stats': {}, 'sources': []})
+            entry['stats'].update(stats)
+            entry['sources'] = sorted(set(entry['sources']) | {os.path.abspath(path) for path in source_paths})
+            entry['last_used'] = time.time()
+            entries[key] = entry
+
+            self.__evict(entries)
+            self.__write(entries)
+
+
+    def invalidate(self, source_path: str = None) -> None:
+        """
+        Remove cached statistics. Either every entry computed from source_path or,
+        if no path is given, the whole cache.
+
+        source_path : str (optional)
+            data file whose statistics should be removed
+        """
+        with self.__locked():
+            if source_path == None:
+                self.__write({})
+                return
+
+            source_path = os.path.abspath(source_path)
+            entries = self.__read()
+            entries = {key: entry for key, entry in entries.items() if source_path not in entry['sources']}
+            self.__write(entries)
+
+
+    def get_entry_count(self) -> int:
+        return len(self.__read())
@@ -0,0 +1,74 @@
+import os
+import sys
+
+import iris
+import iris.coords
+import iris.cube
+import numpy as np
+import pytest
+
+from cf_units import Unit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import catalogloader as cl
+
+# Days in the test catalog, one file and one timestep per day
+DAY_COUNT = 5
+
+
+@pytest.fixture
+def daily_files(tmp_path) -> list:
+    "A catalog of netCDF files holding one timestep of air_temperature each"
+    latitude = iris.coords.DimCoord(np.linspace(-60, 60, 4), standard_name='latitude', units='degrees')
+    longitude = iris.coords.DimCoord(np.linspace(0, 270, 4), standard_name='longitude', units='degrees')
+
+    paths = []
+    for day in range(DAY_COUNT):
+        time = iris.coords.DimCoord([float(day)], standard_name='time', units=Unit('days since 2000-01-01', calendar='standard'))
+        data = np.full((1, 4, 4), 280 + day, dtype=np.float32)
+        cube = iris.cube.Cube(data, standard_name='air_temperature', units='K', dim_coords_and_dims=[(time, 0), (latitude, 1), (longitude, 2)])
+        cube.attributes['history'] = f'day {day}'
+
+        path = str(tmp_path / f'day_{day:02d}.nc')
+        iris.save(cube, path)
+        paths.append(path)
+    return paths
+
+
+def make_loader(tmp_path, paths: list) -> cl.CatalogLoader:
+    return cl.CatalogLoader(paths, index_path=str(tmp_path / 'index' / 'catalog.json'), processes=1)
+
+
+def test_get_cube_concatenates_files(tmp_path, daily_files):
+    cube = make_loader(tmp_path, daily_files).get_cube('air_temperature')
+    assert cube.shape == (DAY_COUNT, 4, 4)
+
+
+def test_time_constraint_with_one_timestep_per_file(tmp_path, daily_files):
+    # the constraint is applied while loading each file, which leaves time scalar in each of them
+    constraint = iris.Constraint(time=lambda cell: cell.point.day > 2)
+    cube = make_loader(tmp_path, daily_files).get_cube('air_temperature', constraint)
+
+    assert cube.shape == (DAY_COUNT - 2, 4, 4)
+    assert cube.coord_dims('time') == (0,)
+    np.testing.assert_array_equal(cube.data[:, 0, 0], [282, 283, 284])
+
+
+def test_time_constraint_matching_one_file(tmp_path, daily_files):
+    constraint = iris.Constraint(time=lambda cell: cell.point.day == 3)
+    cube = make_loader(tmp_path, daily_files).get_cube('air_temperature', constraint)
+
+    # as from extracting a single time from the whole cube
+    assert cube.shape == (4, 4)
+    assert cube.coord('time').shape == (1,)
+
+
+def test_time_constraint_matches_cached_cube(tmp_path, daily_files):
+    constraint = iris.Constraint(time=lambda cell: cell.point.day > 2)
+    loader = make_loader(tmp_path, daily_files)
+    loaded = loader.get_cube('air_temperature', constraint)
+    extracted = make_loader(tmp_path, daily_files).get_cube('air_temperature').extract(constraint)
+
+    assert loaded.shape == extracted.shape
+    np.testing.assert_array_equal(loaded.data, extracted.data)
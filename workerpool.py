@@ -0,0 +1,26 @@
+"""
+Pools of worker processes shared by the parts of the package that work in parallel:
+rendering frames, loading catalogs and running batches.
+"""
+import concurrent.futures
+import multiprocessing
+
+
+def make_process_pool(processes: int, initializer=None, initargs: tuple = (), executor: bool = False):
+    """
+    Start a pool of worker processes. The workers are spawned rather than forked, as forked
+    workers can deadlock on locks held by dask or HDF5 threads in this process.
+
+    processes : int
+        number of worker processes
+    initializer : Callable (optional)
+        called with initargs when each worker starts
+    initargs : tuple (optional)
+        arguments of initializer
+    executor : bool (optional)
+        return a concurrent.futures.ProcessPoolExecutor, e.g. for asyncio, rather than a multiprocessing.Pool
+    """
+    context = multiprocessing.get_context('spawn')
+    if executor == True:
+        return concurrent.futures.ProcessPoolExecutor(processes, mp_context=context, initializer=initializer, initargs=initargs)
+    return context.Pool(processes, initializer=initializer, initargs=initargs)